@@ -7,11 +7,275 @@ import pytesseract
 from PIL import Image
 from typing import List, Dict, Tuple, Optional
 import base64
+import hashlib
+import logging
+import multiprocessing
 import os
+import queue
+import re
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import lmdb
+    LMDB_AVAILABLE = True
+except ImportError:
+    LMDB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Formats browsers can render directly, stored without re-encoding
+PASSTHROUGH_IMAGE_FORMATS = ('png', 'jpeg', 'jpg', 'webp')
+
+# Whitespace-delimited words, matching str.split()
+WORD_PATTERN = re.compile(r'\S+')
+
+# Industry keyword mappings
+INDUSTRY_KEYWORDS = {
+    'medical': ['patient', 'diagnosis', 'treatment', 'medical', 'hospital', 'doctor', 'medicine', 'clinical', 'therapy', 'healthcare'],
+    'finance': ['investment', 'financial', 'loan', 'bank', 'credit', 'portfolio', 'revenue', 'profit', 'accounting', 'fiscal'],
+    'retail': ['product', 'customer', 'sale', 'price', 'inventory', 'retail', 'shopping', 'merchandise', 'store', 'brand'],
+    'education': ['student', 'course', 'curriculum', 'learning', 'education', 'academic', 'university', 'school', 'teaching', 'study'],
+    'legal': ['contract', 'legal', 'court', 'law', 'agreement', 'clause', 'attorney', 'litigation', 'compliance', 'regulation']
+}
+
+# Distinct keyword matches needed before an industry is detected
+INDUSTRY_MIN_KEYWORDS = 3
+
+# OCR results kept in memory; the LMDB cache holds the rest
+OCR_MEMORY_CACHE_SIZE = 1024
+
+# Maximum size of the persistent OCR cache
+OCR_CACHE_MAP_SIZE = 1 << 30
+
+# LMDB allows one open environment per path per process, so share them
+_ocr_cache_envs: Dict[str, 'lmdb.Environment'] = {}
+
+# Beyond ~6 workers page extraction stops scaling (IPC overhead dominates)
+MAX_PAGE_WORKERS = 6
+
+# Page extraction workers, shared by every PDFProcessor and started on first use
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+# Extracted images buffered between pipeline stages, bounding memory on huge pages
+PIPELINE_QUEUE_SIZE = 8
+
+
+def _build_text_entry(page_num: int, text: str) -> Optional[Dict]:
+    """Build the text entry for a page, or None if the page has no text."""
+    if not text.strip():
+        return None
+    return {
+        'page': page_num + 1,
+        'text': text,
+        'bbox': None  # Could add bounding box info if needed
+    }
+
+
+def _extract_image(doc: fitz.Document, xref: int) -> Dict:
+    """
+    Extract an image's encoded bytes, format and size.
+    
+    Formats browsers can't display are rendered to PNG through a PyMuPDF
+    Pixmap rather than a PIL decode and re-encode.
+    """
+    base_image = doc.extract_image(xref)
+    if base_image["ext"].lower() in PASSTHROUGH_IMAGE_FORMATS:
+        return base_image
+    
+    pix = fitz.Pixmap(doc, xref)
+    if pix.n - pix.alpha >= 4:  # CMYK and similar can't be written as PNG
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    png_image = {
+        'image': pix.tobytes("png"),
+        'ext': 'png',
+        'width': pix.width,
+        'height': pix.height,
+    }
+    pix = None
+    return png_image
+
+
+def _build_image_entry(page_num: int, img_index: int, base_image: Dict) -> Dict:
+    """
+    Build the stored entry for an image extracted with `_extract_image`.
+    
+    OCR is left to the caller so it can be batched across the whole document;
+    the entry carries its encoded bytes and format under '_ocr_image' for that
+    pass.
+    """
+    image_bytes = base_image["image"]
+    image_format = base_image["ext"].lower()
+    
+    # Convert to base64 for storage
+    img_base64 = base64.b64encode(image_bytes).decode()
+    
+    return {
+        'page': page_num + 1,
+        'index': img_index,
+        'image_data': img_base64,
+        'format': image_format,
+        'ocr_text': '',
+        'width': base_image["width"],
+        'height': base_image["height"],
+        '_ocr_image': (image_bytes, image_format),
+    }
+
+
+def _process_page(pdf_path: str, page_num: int) -> Dict:
+    """
+    Extract text and images from a single PDF page.
+    
+    Opens its own document handle so it can run in a worker process.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_num: Zero-based page number
+        
+    Returns:
+        Dict with the page's text entry (or None) and its image entries
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        page = doc[page_num]
+        page_result = {'text': _build_text_entry(page_num, page.get_text()), 'images': []}
+        
+        # Extract images
+        image_list = page.get_images()
+        for img_index, img in enumerate(image_list):
+            try:
+                base_image = _extract_image(doc, img[0])
+                page_result['images'].append(_build_image_entry(page_num, img_index, base_image))
+            except Exception as e:
+                logger.warning("Error extracting image %d from page %d: %s", img_index, page_num + 1, e)
+        
+        return page_result
+    finally:
+        doc.close()
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared page extraction pool, starting it if needed.
+    
+    Workers come from a fork server (or are spawned where there is none)
+    rather than forked from the server, whose other threads may hold locks
+    that a forked child would inherit locked.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _page_pool = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, MAX_PAGE_WORKERS),
+                mp_context=multiprocessing.get_context(start_method)
+            )
+        return _page_pool
+
+
+def _process_pages_in_pool(pdf_path: str, n_pages: int) -> List[Dict]:
+    """Extract every page in the shared worker pool, one result dict per page."""
+    global _page_pool
+    pool = _get_page_pool()
+    try:
+        return list(pool.map(_process_page, repeat(pdf_path), range(n_pages), chunksize=4))
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next document
+        with _page_pool_lock:
+            if _page_pool is pool:
+                _page_pool = None
+        raise
+
+
+def _process_pages_pipelined(pdf_path: str, n_pages: int) -> List[Dict]:
+    """
+    Extract text and images from every page using two overlapping stages.
+    
+    A producer thread runs the PyMuPDF extraction (which releases the GIL for
+    much of its C-level work) while the calling thread converts and encodes
+    the images it hands over through a bounded queue. Used for short documents
+    where a process pool costs more than it saves.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        n_pages: Number of pages in the document
+        
+    Returns:
+        One result dict per page, as returned by `_process_page`
+    """
+    page_results = [{'text': None, 'images': []} for _ in range(n_pages)]
+    extracted_images = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    producer_errors = []
+    
+    def produce():
+        try:
+            doc = fitz.open(pdf_path)
+            try:
+                for page_num in range(n_pages):
+                    page = doc[page_num]
+                    page_results[page_num]['text'] = _build_text_entry(page_num, page.get_text())
+                    
+                    for img_index, img in enumerate(page.get_images()):
+                        try:
+                            extracted_images.put((page_num, img_index, _extract_image(doc, img[0])))
+                        except Exception as e:
+                            logger.warning("Error extracting image %d from page %d: %s", img_index, page_num + 1, e)
+            finally:
+                doc.close()
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            extracted_images.put(None)
+    
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    
+    while True:
+        item = extracted_images.get()
+        if item is None:
+            break
+        page_num, img_index, base_image = item
+        try:
+            page_results[page_num]['images'].append(_build_image_entry(page_num, img_index, base_image))
+        except Exception as e:
+            logger.warning("Error extracting image %d from page %d: %s", img_index, page_num + 1, e)
+    
+    producer.join()
+    if producer_errors:
+        raise producer_errors[0]
+    
+    return page_results
+
 
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self, ocr_cache_path: Optional[str] = None):
+        """
+        Initialize the PDF processor.
+        
+        Args:
+            ocr_cache_path: Optional LMDB directory for persisting OCR results
+                across runs (defaults to the OCR_CACHE_PATH environment variable)
+        """
         self.supported_formats = ['pdf']
+        # Probing spawns `tesseract --version`, so only do it once
+        self._tesseract_ok = self._is_tesseract_available()
+        # OCR text keyed by MD5 of the image bytes; logos and headers repeat a lot
+        self._ocr_cache: 'OrderedDict[str, str]' = OrderedDict()  # in LRU order
+        self._ocr_cache_lock = threading.Lock()
+        self._ocr_cache_env = self._open_ocr_cache(ocr_cache_path or os.getenv("OCR_CACHE_PATH"))
+        self._industry_automaton = self._build_industry_automaton()
     
     def extract_content(self, pdf_path: str) -> Dict:
         """
@@ -39,76 +303,176 @@ class PDFProcessor:
                 'confidence_score': 0.0
             }
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Extract text
-                text = page.get_text()
-                if text.strip():
-                    extracted_content['text_content'].append({
-                        'page': page_num + 1,
-                        'text': text,
-                        'bbox': None  # Could add bounding box info if needed
-                    })
-                
-                # Extract images
-                image_list = page.get_images()
-                for img_index, img in enumerate(image_list):
-                    try:
-                        # Get image data
-                        xref = img[0]
-                        base_image = doc.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        
-                        # Convert to PIL Image for processing
-                        image = Image.open(io.BytesIO(image_bytes))
-                        
-                        # OCR on image if it might contain text
-                        ocr_text = self._perform_ocr(image)
-                        
-                        # Convert to base64 for storage
-                        buffered = io.BytesIO()
-                        image.save(buffered, format="PNG")
-                        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-                        
-                        extracted_content['images'].append({
-                            'page': page_num + 1,
-                            'index': img_index,
-                            'image_data': img_base64,
-                            'ocr_text': ocr_text,
-                            'width': image.width,
-                            'height': image.height,
-                        })
-                        
-                    except Exception as e:
-                        print(f"Error extracting image {img_index} from page {page_num + 1}: {e}")
-            
+            n_pages = len(doc)
             doc.close()
+            
+            # Pages are independent, so fan them out across processes; PyMuPDF
+            # holds the GIL for most of its work, so threads would not scale.
+            # Short documents don't amortize the pool, so they overlap
+            # extraction and encoding on threads instead.
+            if n_pages <= 2:
+                page_results = _process_pages_pipelined(pdf_path, n_pages)
+            else:
+                page_results = _process_pages_in_pool(pdf_path, n_pages)
+            
+            for page_result in page_results:
+                if page_result['text'] is not None:
+                    extracted_content['text_content'].append(page_result['text'])
+                extracted_content['images'].extend(page_result['images'])
+            
+            # OCR every image in one tesseract run instead of one per image
+            images = extracted_content['images']
+            ocr_texts = self._ocr_images([image.pop('_ocr_image') for image in images])
+            for image, ocr_text in zip(images, ocr_texts):
+                image['ocr_text'] = ocr_text
+            
             return extracted_content
             
         except Exception as e:
             raise Exception(f"Error processing PDF: {str(e)}")
     
-    def _perform_ocr(self, image: Image.Image) -> str:
+    def _perform_ocr(self, image_bytes: bytes) -> str:
         """
         Perform OCR on an image to extract text.
         
         Args:
-            image: PIL Image object
+            image_bytes: Encoded image bytes
             
         Returns:
-            Extracted text string
+            Extracted text string, or "" if the image can't be read
         """
         try:
             # Only perform OCR if tesseract is available
-            if self._is_tesseract_available():
-                text = pytesseract.image_to_string(image)
+            if self._tesseract_ok:
+                text = pytesseract.image_to_string(Image.open(io.BytesIO(image_bytes)))
                 return text.strip()
             return ""
         except Exception as e:
-            print(f"OCR error: {e}")
+            logger.warning("OCR error: %s", e)
             return ""
     
+    def _open_ocr_cache(self, path: Optional[str]):
+        """Open the persistent LMDB OCR cache, if configured and available."""
+        if not path or not LMDB_AVAILABLE:
+            return None
+        
+        path = os.path.abspath(path)
+        if path not in _ocr_cache_envs:
+            try:
+                _ocr_cache_envs[path] = lmdb.open(path, map_size=OCR_CACHE_MAP_SIZE)
+            except Exception as e:
+                logger.warning("Failed to open OCR cache at %s: %s", path, e)
+                return None
+        return _ocr_cache_envs[path]
+    
+    def _ocr_images(self, images: List[Tuple[bytes, str]]) -> List[str]:
+        """
+        OCR images, reusing cached results for byte-identical images.
+        
+        Args:
+            images: Encoded image bytes and their format (e.g. 'png')
+            
+        Returns:
+            Extracted text for each image, in the same order
+        """
+        keys = [hashlib.md5(image_bytes).hexdigest() for image_bytes, _ in images]
+        
+        # Collect this call's results locally so evictions can't drop them
+        results = {}
+        misses = {}
+        with self._ocr_cache_lock:
+            for key, image in zip(keys, images):
+                if key in results or key in misses:
+                    continue
+                if key in self._ocr_cache:
+                    self._ocr_cache.move_to_end(key)
+                    results[key] = self._ocr_cache[key]
+                else:
+                    misses[key] = image
+        
+        if misses and self._ocr_cache_env is not None:
+            try:
+                with self._ocr_cache_env.begin() as txn:
+                    for key in list(misses):
+                        cached = txn.get(key.encode())
+                        if cached is not None:
+                            results[key] = cached.decode()
+                            del misses[key]
+            except lmdb.Error as e:
+                # Whatever wasn't read yet is simply OCRed again
+                logger.warning("OCR cache read failed: %s", e)
+        
+        if misses:
+            ocr_texts = self._perform_batch_ocr(list(misses.values()))
+            results.update(zip(misses.keys(), ocr_texts))
+            
+            # Don't persist the empty results returned when tesseract is missing
+            if self._ocr_cache_env is not None and self._tesseract_ok:
+                try:
+                    with self._ocr_cache_env.begin(write=True) as txn:
+                        for key, ocr_text in zip(misses.keys(), ocr_texts):
+                            txn.put(key.encode(), ocr_text.encode())
+                except lmdb.Error as e:
+                    logger.warning("OCR cache write failed: %s", e)
+        
+        with self._ocr_cache_lock:
+            self._ocr_cache.update(results)
+            while len(self._ocr_cache) > OCR_MEMORY_CACHE_SIZE:
+                self._ocr_cache.popitem(last=False)
+        
+        return [results[key] for key in keys]
+    
+    def _perform_batch_ocr(self, images: List[Tuple[bytes, str]]) -> List[str]:
+        """
+        Perform OCR on many images with a single tesseract invocation.
+        
+        Tesseract accepts a text file listing image paths and separates the
+        output for each image with a form feed, so the model is loaded once
+        instead of once per image.
+        
+        Args:
+            images: Encoded image bytes and their format (e.g. 'png')
+            
+        Returns:
+            Extracted text for each image, in the same order
+        """
+        if not images:
+            return []
+        if not self._tesseract_ok:
+            return [""] * len(images)
+        
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                image_paths = []
+                for i, (image_bytes, image_format) in enumerate(images):
+                    image_path = os.path.join(temp_dir, f"img{i}.{image_format}")
+                    with open(image_path, 'wb') as f:
+                        f.write(image_bytes)
+                    image_paths.append(image_path)
+                
+                list_path = os.path.join(temp_dir, 'images.txt')
+                with open(list_path, 'w') as f:
+                    f.write('\n'.join(image_paths) + '\n')
+                
+                # OpenMP threading inside tesseract hurts throughput on batches. pytesseract
+                # always hands tesseract our own environment, so run it directly.
+                env = dict(os.environ)
+                env.setdefault('OMP_THREAD_LIMIT', '1')
+                result = subprocess.run(
+                    [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout'],
+                    capture_output=True, env=env, check=True
+                )
+                output = result.stdout.decode('utf-8', errors='replace')
+            
+            texts = output.split('\f')
+            if len(texts) >= len(images):
+                return [text.strip() for text in texts[:len(images)]]
+            logger.warning("Batch OCR returned %d results for %d images, retrying per image", len(texts), len(images))
+        except Exception as e:
+            logger.warning("Batch OCR error: %s", e)
+        
+        return [self._perform_ocr(image_bytes) for image_bytes, _ in images]
+    
     def _is_tesseract_available(self) -> bool:
         """Check if Tesseract OCR is available on the system."""
         try:
@@ -136,31 +500,43 @@ class PDFProcessor:
             page_num = page_content['page']
             text = page_content['text']
             
-            # Simple word-based chunking (rough token estimation)
-            words = text.split()
+            # Simple word-based chunking (rough token estimation). Record where
+            # each word starts and ends so chunks are single slices of the page
+            # text rather than re-joined word lists.
+            word_spans = [match.span() for match in WORD_PATTERN.finditer(text)]
+            n_words = len(word_spans)
             
-            i = 0
-            while i < len(words):
+            # Move forward by chunk_size - overlap
+            for i in range(0, n_words, max(1, chunk_size - overlap)):
                 # Take chunk_size words
-                chunk_words = words[i:i + chunk_size]
-                chunk_text = ' '.join(chunk_words)
+                end = min(i + chunk_size, n_words)
+                chunk_text = text[word_spans[i][0]:word_spans[end - 1][1]]
                 
                 chunks.append({
                     'chunk_id': chunk_id,
                     'text': chunk_text,
                     'page': page_num,
                     'start_word': i,
-                    'end_word': min(i + chunk_size, len(words)),
-                    'word_count': len(chunk_words)
+                    'end_word': end,
+                    'word_count': end - i
                 })
                 
                 chunk_id += 1
-                
-                # Move forward by chunk_size - overlap
-                i += max(1, chunk_size - overlap)
         
         return chunks
     
+    def _build_industry_automaton(self):
+        """Build an Aho-Corasick automaton over all industry keywords, if available."""
+        if not AHOCORASICK_AVAILABLE:
+            return None
+        
+        automaton = ahocorasick.Automaton()
+        for industry, keywords in INDUSTRY_KEYWORDS.items():
+            for keyword in keywords:
+                automaton.add_word(keyword, (industry, keyword))
+        automaton.make_automaton()
+        return automaton
+    
     def detect_industry(self, text_content: List[Dict]) -> Optional[str]:
         """
         Detect document industry based on keywords and content analysis.
@@ -171,30 +547,32 @@ class PDFProcessor:
         Returns:
             Detected industry string or None
         """
-        # Combine all text
-        full_text = ' '.join([page['text'].lower() for page in text_content])
-        
-        # Industry keyword mappings
-        industry_keywords = {
-            'medical': ['patient', 'diagnosis', 'treatment', 'medical', 'hospital', 'doctor', 'medicine', 'clinical', 'therapy', 'healthcare'],
-            'finance': ['investment', 'financial', 'loan', 'bank', 'credit', 'portfolio', 'revenue', 'profit', 'accounting', 'fiscal'],
-            'retail': ['product', 'customer', 'sale', 'price', 'inventory', 'retail', 'shopping', 'merchandise', 'store', 'brand'],
-            'education': ['student', 'course', 'curriculum', 'learning', 'education', 'academic', 'university', 'school', 'teaching', 'study'],
-            'legal': ['contract', 'legal', 'court', 'law', 'agreement', 'clause', 'attorney', 'litigation', 'compliance', 'regulation']
-        }
+        # Collect the distinct keywords found for each industry, page by page,
+        # stopping as soon as one industry has enough matches to be detected
+        matched_keywords = {industry: set() for industry in INDUSTRY_KEYWORDS}
+        for page in text_content:
+            page_text = page['text'].lower()
+            
+            if self._industry_automaton is not None:
+                # Single pass over the page for all keywords
+                for _, (industry, keyword) in self._industry_automaton.iter(page_text):
+                    matched_keywords[industry].add(keyword)
+            else:
+                for industry, keywords in INDUSTRY_KEYWORDS.items():
+                    matched_keywords[industry].update(keyword for keyword in keywords if keyword in page_text)
+            
+            if any(len(keywords) >= INDUSTRY_MIN_KEYWORDS for keywords in matched_keywords.values()):
+                break
         
         # Score each industry
-        industry_scores = {}
-        for industry, keywords in industry_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in full_text)
-            industry_scores[industry] = score
+        industry_scores = {industry: len(keywords) for industry, keywords in matched_keywords.items()}
         
         # Return industry with highest score if above threshold
         max_industry = max(industry_scores.keys(), key=lambda k: industry_scores[k])
         max_score = industry_scores[max_industry]
         
         # Require at least 3 keyword matches
-        if max_score >= 3:
+        if max_score >= INDUSTRY_MIN_KEYWORDS:
             return max_industry
         
         return None
@@ -1,27 +1,183 @@
 """
 RAG (Retrieval-Augmented Generation) engine that combines vector search with LLM generation.
 """
-from typing import List, Dict, Optional, Tuple
-from .vector_store import VectorStore, MultiModalVectorStore
+import asyncio
+import copy
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from typing import AbstractSet, List, Dict, Optional, Tuple
+import numpy as np
+from .vector_store import VectorStore, ProximityCache
 from .llm_client import LLMClient
 import re
 
+# Regexes used on every query, compiled once at import
+WORD_PATTERN = re.compile(r'\b\w+\b')
+NUMBER_PATTERN = re.compile(r'\d+')
+QUOTED_PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+# Common words ignored when extracting question keywords
+STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'but', 'is', 'are', 'was', 'were',
+    'be', 'been', 'being', 'in', 'on', 'at', 'to', 'for', 'with', 'by',
+    'about', 'like', 'through', 'over', 'before', 'after', 'between',
+    'under', 'above', 'of', 'during', 'what', 'when', 'where', 'why',
+    'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'some',
+    'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than',
+    'too', 'very', 'can', 'will', 'just', 'should', 'now'
+})
+
+# Question terms that suggest numerical data is wanted
+NUMERIC_QUESTION_TERMS = ('how many', 'how much', 'number', 'amount', 'percentage', 'rate')
+
+# Role instruction for each query mode
+PROMPT_INSTRUCTIONS = {
+    "standard": "You are an AI assistant that answers questions based on provided document content.",
+    "industry": "You are an AI assistant specializing in industry-specific document analysis.",
+    "medical": "You are an AI assistant with expertise in medical document analysis. Provide accurate, evidence-based responses.",
+    "finance": "You are an AI assistant with expertise in financial document analysis.",
+    "retail": "You are an AI assistant with expertise in retail and product documentation.",
+    "education": "You are an AI assistant with expertise in educational content analysis."
+}
+
+# Prompt templates; only {context} and {question} are filled in per request
+PROMPT_TEMPLATE = """{instruction}
+
+Please answer the following question based ONLY on the provided context from the documents. If the context doesn't contain enough information to answer the question completely, say so clearly.
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+INSTRUCTIONS:
+- Base your answer strictly on the provided context
+- If information is not available in the context, state this clearly
+- Provide specific references to source documents and pages when possible
+- Be concise but comprehensive
+- If the question asks for something not covered in the documents, explain what information is missing
+- Ensure your answer is well-structured and easy to understand
+- If appropriate, use bullet points or numbered lists for clarity
+
+ANSWER:"""
+
+COMPARISON_PROMPT_TEMPLATE = """You are an AI assistant that specializes in comparing and contrasting information across multiple documents.
+
+Please compare the information from the different documents provided in the context below, focusing on the specific question asked.
+
+CONTEXT FROM MULTIPLE DOCUMENTS:
+{context}
+
+COMPARISON QUESTION: {question}
+
+INSTRUCTIONS:
+- Compare and contrast the information from each document
+- Highlight similarities and differences
+- Point out any contradictions or complementary information
+- Reference specific documents and pages
+- If any document lacks relevant information, mention this
+- Provide a balanced analysis based on the available content
+- Structure your response with clear sections:
+  1. Similarities
+  2. Differences
+  3. Key Insights
+- Use bullet points for clarity where appropriate
+
+COMPARISON ANALYSIS:"""
+
+class AnswerCache:
+    """
+    LRU cache of query responses whose entries expire after `ttl` seconds.
+    
+    Callers make keys with `make_key`, including anything the answer depends
+    on, so stale entries are simply never looked up again and age out.
+    """
+    
+    def __init__(self, capacity: int = 1024, ttl: float = 3600):
+        """
+        Initialize the cache.
+        
+        Args:
+            capacity: Maximum number of cached responses
+            ttl: Seconds a response stays valid
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # key -> (expiry time, response)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(question: str, *scope) -> str:
+        """Hash a question, normalized for case and whitespace, together with its scope."""
+        normalized = " ".join(question.lower().split())
+        return hashlib.blake2b(repr((normalized,) + scope).encode('utf-8'), digest_size=16).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Get a copy of a cached response, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(response)
+    
+    def put(self, key: str, response: Dict):
+        """Cache a response, evicting the least recently used one if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(response))
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop all cached responses."""
+        with self._lock:
+            self._entries.clear()
+
 class RAGEngine:
-    def __init__(self, vector_store: VectorStore, llm_client: LLMClient):
+    def __init__(self, vector_store: VectorStore, llm_client: LLMClient,
+                 cache_similarity_threshold: float = 0.95, cache_capacity: int = 256,
+                 answer_cache_capacity: int = 1024, answer_cache_ttl: float = 3600):
         """
         Initialize RAG engine.
         
         Args:
             vector_store: Vector store for similarity search
             llm_client: LLM client for text generation
+            cache_similarity_threshold: Query similarity needed to reuse cached search results
+            cache_capacity: Maximum number of cached searches
+            answer_cache_capacity: Maximum number of cached answers
+            answer_cache_ttl: Seconds a cached answer stays valid
         """
         self.vector_store = vector_store
         self.llm_client = llm_client
+        self.search_cache = ProximityCache(vector_store.dimension, cache_similarity_threshold, cache_capacity)
+        self.answer_cache = AnswerCache(answer_cache_capacity, answer_cache_ttl)
         
         # RAG configuration
         self.max_context_length = 4000  # Max tokens for context
         self.min_relevance_score = 0.3  # Minimum similarity score
+        self.min_chunk_length = 50  # Minimum chunk length in characters
         self.max_sources = 5  # Maximum number of source chunks
+        self.comparison_chunks_per_document = 5  # Candidate chunks per document when comparing
+        
+        # Per-mode prompts with the role instruction already filled in
+        self._prompt_templates = {
+            mode: PROMPT_TEMPLATE.replace("{instruction}", instruction)
+            for mode, instruction in PROMPT_INSTRUCTIONS.items()
+        }
+        # Words in each template outside the placeholders, for prompt token counts
+        self._prompt_template_tokens = {
+            mode: len(template.format(context="", question="").split())
+            for mode, template in self._prompt_templates.items()
+        }
     
     def query(self, 
               question: str, 
@@ -42,15 +198,41 @@ class RAGEngine:
         """
         max_sources = max_sources if max_sources is not None else self.max_sources
         
-        # Step 1: Retrieve relevant chunks
-        search_results = self.vector_store.search(
-            question, 
-            k=max_sources * 3,  # Get more results for better filtering
-            document_ids=document_ids
+        # Identical questions over an unchanged store reuse the previous answer
+        answer_key = AnswerCache.make_key(
+            question,
+            tuple(sorted(document_ids)) if document_ids else None,
+            mode,
+            max_sources,
+            self.vector_store.revision
         )
+        cached_response = self.answer_cache.get(answer_key)
+        if cached_response is not None:
+            return cached_response
+        
+        # Step 1: Retrieve relevant chunks, reusing results from near-identical questions
+        query_embedding = self.vector_store.embed_query(question)
+        k = max_sources * 3  # Get more results for better filtering
+        search_scope = (
+            self.vector_store.revision,
+            k,
+            tuple(sorted(document_ids)) if document_ids else None,
+            self.min_relevance_score,
+            self.min_chunk_length,
+        )
+        search_results = self.search_cache.lookup(query_embedding, search_scope)
+        if search_results is None:
+            search_results = self.vector_store.search_by_vector(
+                query_embedding, 
+                k=k,
+                document_ids=document_ids,
+                score_threshold=self.min_relevance_score,
+                min_text_length=self.min_chunk_length
+            )
+            self.search_cache.insert(query_embedding, search_scope, search_results)
         
         # Step 2: Filter and rank results
-        relevant_chunks = self._filter_chunks(search_results, question)[:max_sources]
+        relevant_chunks = self._filter_chunks(search_results, question, max_sources)
         
         if not relevant_chunks:
             return {
@@ -61,7 +243,7 @@ class RAGEngine:
             }
         
         # Step 3: Build context for LLM
-        context = self._build_context(relevant_chunks, mode)
+        context, context_tokens = self._build_context(relevant_chunks, mode)
         
         # Step 4: Generate answer using LLM
         prompt = self._build_prompt(question, context, mode)
@@ -70,14 +252,16 @@ class RAGEngine:
             answer = self.llm_client.generate(prompt, max_tokens=800, temperature=0.7)
             
             # Step 5: Format response
-            return {
+            response = {
                 "answer": answer.strip(),
                 "sources": self._format_sources(relevant_chunks),
                 "confidence": self._calculate_confidence(relevant_chunks),
                 "mode": mode,
-                "prompt_tokens": len(prompt.split()),
+                "prompt_tokens": self._count_prompt_tokens(question, context_tokens, mode),
                 "context_chunks": len(relevant_chunks)
             }
+            self.answer_cache.put(answer_key, response)
+            return response
             
         except Exception as e:
             return {
@@ -107,13 +291,85 @@ class RAGEngine:
                 "mode": "comparison"
             }
         
-        # Get relevant chunks from each document
+        # Get relevant chunks from all documents in one search, then split
+        # them up by document
+        query_embedding = self.vector_store.embed_query(question)
+        
+        results_by_doc = {doc_id: [] for doc_id in document_ids}
+        search_results = self.vector_store.search_by_vector(
+            query_embedding,
+            k=self.comparison_chunks_per_document * len(document_ids),
+            document_ids=document_ids,
+            score_threshold=self.min_relevance_score,
+            min_text_length=self.min_chunk_length
+        )
+        for result in search_results:
+            results_by_doc[result['document_id']].append(result)
+        
+        # A document that ranks low overall can come back short or empty, so
+        # search it on its own; like acompare_documents, every document then
+        # gets its top chunks
+        for doc_id, results in results_by_doc.items():
+            if len(results) < self.comparison_chunks_per_document:
+                results_by_doc[doc_id] = self.vector_store.search_by_vector(
+                    query_embedding,
+                    k=self.comparison_chunks_per_document,
+                    document_ids=[doc_id],
+                    score_threshold=self.min_relevance_score,
+                    min_text_length=self.min_chunk_length
+                )
+            else:
+                del results[self.comparison_chunks_per_document:]
+        
+        return self._answer_comparison(question, document_ids, results_by_doc)
+    
+    async def acompare_documents(self, question: str, document_ids: List[str]) -> Dict:
+        """
+        Async variant of `compare_documents` with a separate search per document.
+        
+        Every document gets its own top chunks even when another document
+        dominates the overall ranking; the searches run concurrently.
+        
+        Args:
+            question: Comparison question
+            document_ids: List of document IDs to compare
+            
+        Returns:
+            Comparison result with side-by-side analysis
+        """
+        if len(document_ids) < 2:
+            return {
+                "answer": "I need at least two documents to perform a comparison.",
+                "sources": [],
+                "confidence": 0.0,
+                "mode": "comparison"
+            }
+        
+        # Embed once so every search shares the same query embedding
+        query_embedding = await asyncio.to_thread(self.vector_store.embed_query, question)
+        search_results = await asyncio.gather(*(
+            self.vector_store.asearch_by_vector(
+                query_embedding,
+                k=self.comparison_chunks_per_document,
+                document_ids=[doc_id],
+                score_threshold=self.min_relevance_score,
+                min_text_length=self.min_chunk_length
+            )
+            for doc_id in document_ids
+        ))
+        results_by_doc = dict(zip(document_ids, search_results))
+        
+        return await asyncio.to_thread(self._answer_comparison, question, document_ids, results_by_doc)
+    
+    def _answer_comparison(self, question: str, document_ids: List[str],
+                           results_by_doc: Dict[str, List[Dict]]) -> Dict:
+        """Filter each document's search results and ask the LLM to compare them."""
         doc_results = {}
         all_sources = []
         
         for doc_id in document_ids:
-            results = self.vector_store.search(question, k=5, document_ids=[doc_id])
-            filtered = self._filter_chunks(results, question)[:3]  # Get more chunks per document
+            results = results_by_doc[doc_id][:self.comparison_chunks_per_document]
+            filtered = self._filter_chunks(results, question, 3)  # Get more chunks per document
             doc_results[doc_id] = filtered
             all_sources.extend(filtered)
         
@@ -149,12 +405,13 @@ class RAGEngine:
                 "error": str(e)
             }
     
-    def _filter_chunks(self, search_results: List[Dict], question: str) -> List[Dict]:
+    def _filter_chunks(self, search_results: List[Dict], question: str, max_results: int = None) -> List[Dict]:
         """Filter and rank chunks based on relevance and quality."""
         filtered = []
         
         # Extract question keywords for better matching
-        question_keywords = self._extract_keywords(question)
+        question_keywords = frozenset(self._extract_keywords(question))
+        question_phrases = self._extract_match_phrases(question)
         
         for result in search_results:
             # Skip chunks with low relevance scores
@@ -162,94 +419,102 @@ class RAGEngine:
                 continue
                 
             # Skip very short chunks
-            if len(result['text'].strip()) < 50:
+            if len(result['text'].strip()) < self.min_chunk_length:
                 continue
             
+            # Scoring and context building reuse these; the vector store
+            # normally tokenizes chunks at ingest
+            result['_lower'] = result['text'].lower()
+            if result.get('_word_set') is None:
+                words = result['_lower'].split()
+                result['_word_set'] = frozenset(words)
+                result['_length'] = len(words)
+            if result.get('_terms') is None:
+                result['_terms'] = frozenset(WORD_PATTERN.findall(result['_lower']))
+            
             # Add quality score based on various factors
-            quality_score = self._calculate_quality_score(result, question, question_keywords)
+            quality_score = self._calculate_quality_score(result, question, question_keywords,
+                                                          question_phrases)
             result['quality_score'] = quality_score
             
-            filtered.append(result)
+            filtered.append((-(result['score'] * 0.6 + quality_score * 0.4), len(filtered), result))
         
-        # Sort by combined score (relevance + quality)
-        filtered.sort(key=lambda x: x['score'] * 0.6 + x['quality_score'] * 0.4, reverse=True)
+        # Rank by combined score (relevance + quality)
+        filtered.sort()
+        ranked = [result for _, _, result in filtered]
         
         # Ensure diversity of content by avoiding too similar chunks
-        diverse_filtered = self._ensure_diversity(filtered)
+        diverse_filtered = self._ensure_diversity(ranked, max_results=max_results)
         
         return diverse_filtered
     
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract important keywords from text."""
-        # Remove common stop words
-        stop_words = {'a', 'an', 'the', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 
-                     'be', 'been', 'being', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 
-                     'about', 'like', 'through', 'over', 'before', 'after', 'between', 
-                     'under', 'above', 'of', 'during', 'what', 'when', 'where', 'why', 
-                     'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'some', 
-                     'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 
-                     'too', 'very', 'can', 'will', 'just', 'should', 'now'}
-        
-        # Tokenize and filter
-        words = re.findall(r'\b\w+\b', text.lower())
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
-        
-        return keywords
+        # Tokenize and remove common stop words
+        return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOP_WORDS and len(word) > 2]
     
-    def _ensure_diversity(self, chunks: List[Dict], similarity_threshold: float = 0.8) -> List[Dict]:
-        """Ensure diversity by removing too similar chunks."""
+    def _ensure_diversity(self, chunks: List[Dict], similarity_threshold: float = 0.8,
+                          max_results: int = None) -> List[Dict]:
+        """Ensure diversity by removing too similar chunks, taking chunks in ranked order."""
+        max_results = max_results if max_results is not None else self.max_sources
         if not chunks:
             return []
+        
+        similarities = self._pairwise_jaccard(chunks)
+        selected = []
+        
+        for i in range(len(chunks)):
+            # Skip chunks too similar to any already selected chunk
+            if selected and similarities[i, selected].max() > similarity_threshold:
+                continue
+            selected.append(i)
             
-        diverse_chunks = [chunks[0]]  # Start with the highest ranked chunk
-        
-        for chunk in chunks[1:]:
-            # Check if this chunk is too similar to any already selected chunk
-            too_similar = False
-            for selected_chunk in diverse_chunks:
-                # Simple text overlap similarity
-                similarity = self._calculate_text_similarity(chunk['text'], selected_chunk['text'])
-                if similarity > similarity_threshold:
-                    too_similar = True
-                    break
-            
-            if not too_similar:
-                diverse_chunks.append(chunk)
-                
             # Stop once we have enough diverse chunks
-            if len(diverse_chunks) >= self.max_sources:
+            if len(selected) >= max_results:
                 break
-                
-        return diverse_chunks
-    
-    def _calculate_text_similarity(self, text1: str, text2: str) -> float:
-        """Calculate simple text similarity based on word overlap."""
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
         
-        if not words1 or not words2:
-            return 0.0
-            
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
+        return [chunks[i] for i in selected]
+    
+    def _pairwise_jaccard(self, chunks: List[Dict]) -> np.ndarray:
+        """
+        Jaccard similarity of every pair of chunks' word sets, as an (n, n) matrix.
         
-        return len(intersection) / len(union)
+        Estimated from MinHash signatures when every chunk has one, else computed
+        exactly from a binary bag-of-words matrix.
+        """
+        signatures = [chunk.get('minhash') for chunk in chunks]
+        if all(signature is not None for signature in signatures):
+            signatures = np.stack(signatures)
+            return (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+        
+        word_sets = [chunk['_word_set'] for chunk in chunks]
+        words = np.array([word for word_set in word_sets for word in word_set], dtype=str)
+        vocabulary, columns = np.unique(words, return_inverse=True)
+        rows = np.repeat(np.arange(len(chunks)), [len(word_set) for word_set in word_sets])
+        
+        bag = np.zeros((len(chunks), len(vocabulary)))
+        bag[rows, columns] = 1.0
+        intersection = bag @ bag.T
+        sizes = bag.sum(axis=1)
+        union = sizes[:, None] + sizes[None, :] - intersection
+        # Chunks without words are similar to nothing
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
     
-    def _calculate_quality_score(self, chunk: Dict, question: str, question_keywords: List[str]) -> float:
-        """Calculate quality score for a chunk."""
-        text = chunk['text'].lower()
+    def _calculate_quality_score(self, chunk: Dict, question: str, question_keywords: AbstractSet[str],
+                                 question_phrases: Optional[List[str]] = None) -> float:
+        """Calculate quality score for a chunk tokenized by `_filter_chunks`."""
+        text = chunk['_lower']
         question_lower = question.lower()
         
         score = 0.0
         
-        # Keyword overlap
-        text_words = set(text.split())
-        keyword_overlap = sum(1 for keyword in question_keywords if keyword in text_words)
+        # Keyword overlap (share of distinct question keywords found in the chunk)
         if question_keywords:
+            keyword_overlap = len(question_keywords & chunk['_terms'])
             score += (keyword_overlap / len(question_keywords)) * 0.4
         
         # Text length (prefer medium-length chunks)
-        text_len = len(text.split())
+        text_len = chunk['_length']
         if 100 <= text_len <= 300:
             score += 0.3
         elif 50 <= text_len < 100 or 300 < text_len <= 500:
@@ -262,33 +527,38 @@ class RAGEngine:
             score += 0.1
         
         # Information density (avoid repetitive text)
-        unique_words = len(set(text.split()))
-        total_words = len(text.split())
+        unique_words = len(chunk['_word_set'])
+        total_words = text_len
         if total_words > 0:
             density = unique_words / total_words
             score += density * 0.2
         
         # Check for exact phrase matches
-        question_phrases = self._extract_phrases(question_lower)
+        if question_phrases is None:
+            question_phrases = self._extract_match_phrases(question)
         for phrase in question_phrases:
-            if phrase in text and len(phrase.split()) > 1:
+            if phrase in text:
                 score += 0.2
                 break
         
         # Check for presence of numbers if question asks for numerical data
-        if any(word in question_lower for word in ['how many', 'how much', 'number', 'amount', 'percentage', 'rate']):
-            if re.search(r'\d+', text):
+        if any(term in question_lower for term in NUMERIC_QUESTION_TERMS):
+            if NUMBER_PATTERN.search(text):
                 score += 0.2
         
         return min(score, 1.0)
     
+    def _extract_match_phrases(self, question: str) -> List[str]:
+        """Extract the multi-word question phrases worth matching exactly against chunks."""
+        return [phrase for phrase in self._extract_phrases(question.lower()) if len(phrase.split()) > 1]
+    
     def _extract_phrases(self, text: str) -> List[str]:
         """Extract meaningful phrases from text."""
         # Simple phrase extraction - can be improved with NLP
         phrases = []
         
         # Extract quoted phrases
-        quoted = re.findall(r'"([^"]*)"', text)
+        quoted = QUOTED_PHRASE_PATTERN.findall(text)
         phrases.extend(quoted)
         
         # Extract noun phrases (simplified)
@@ -299,25 +569,38 @@ class RAGEngine:
         
         return phrases
     
-    def _build_context(self, chunks: List[Dict], mode: str) -> str:
-        """Build context string from relevant chunks."""
-        context_parts = []
+    def _build_context(self, chunks: List[Dict], mode: str) -> Tuple[str, int]:
+        """Build context string from relevant chunks, along with its word count."""
+        context = io.StringIO()
+        total_tokens = 0
         
         for i, chunk in enumerate(chunks):
             doc_id = chunk['document_id']
             page = chunk['metadata'].get('page', 'Unknown')
             text = chunk['text'].strip()
+            header = f"[Source {i+1} - Document: {doc_id}, Page: {page}]"
+            part = f"{header}\n{text}\n"
             
-            context_parts.append(f"[Source {i+1} - Document: {doc_id}, Page: {page}]\n{text}\n")
-        
-        context = "\n".join(context_parts)
-        
-        # Truncate if too long
-        if len(context.split()) > self.max_context_length:
-            words = context.split()[:self.max_context_length]
-            context = " ".join(words) + "... [truncated]"
+            text_tokens = chunk['_length'] if '_length' in chunk else len(text.split())
+            part_tokens = len(header.split()) + text_tokens
+            
+            if i > 0:
+                context.write("\n")
+            
+            # Truncate once the token budget is used up
+            remaining = self.max_context_length - total_tokens
+            if part_tokens > remaining:
+                # maxsplit stops tokenizing the last chunk once the budget is reached
+                words = part.split(maxsplit=remaining)[:remaining]
+                context.write(" ".join(words) + "... [truncated]")
+                # "[truncated]" is one more word, "..." one more if no word precedes it
+                total_tokens += max(remaining, 1) + 1
+                break
+            
+            context.write(part)
+            total_tokens += part_tokens
         
-        return context
+        return context.getvalue(), total_tokens
     
     def _build_comparison_context(self, doc_results: Dict[str, List[Dict]], question: str) -> str:
         """Build context for document comparison."""
@@ -338,66 +621,17 @@ class RAGEngine:
     
     def _build_prompt(self, question: str, context: str, mode: str) -> str:
         """Build prompt for the LLM."""
-        base_instructions = {
-            "standard": "You are an AI assistant that answers questions based on provided document content.",
-            "industry": "You are an AI assistant specializing in industry-specific document analysis.",
-            "medical": "You are an AI assistant with expertise in medical document analysis. Provide accurate, evidence-based responses.",
-            "finance": "You are an AI assistant with expertise in financial document analysis.",
-            "retail": "You are an AI assistant with expertise in retail and product documentation.",
-            "education": "You are an AI assistant with expertise in educational content analysis."
-        }
-        
-        instruction = base_instructions.get(mode, base_instructions["standard"])
-        
-        prompt = f"""{instruction}
-
-Please answer the following question based ONLY on the provided context from the documents. If the context doesn't contain enough information to answer the question completely, say so clearly.
-
-CONTEXT:
-{context}
-
-QUESTION: {question}
-
-INSTRUCTIONS:
-- Base your answer strictly on the provided context
-- If information is not available in the context, state this clearly
-- Provide specific references to source documents and pages when possible
-- Be concise but comprehensive
-- If the question asks for something not covered in the documents, explain what information is missing
-- Ensure your answer is well-structured and easy to understand
-- If appropriate, use bullet points or numbered lists for clarity
-
-ANSWER:"""
-
-        return prompt
+        prompt_template = self._prompt_templates.get(mode, self._prompt_templates["standard"])
+        return prompt_template.format(context=context, question=question)
+    
+    def _count_prompt_tokens(self, question: str, context_tokens: int, mode: str) -> int:
+        """Word count of the prompt built for this question, without re-splitting it."""
+        template_tokens = self._prompt_template_tokens.get(mode, self._prompt_template_tokens["standard"])
+        return template_tokens + context_tokens + len(question.split())
     
     def _build_comparison_prompt(self, question: str, context: str) -> str:
         """Build prompt for document comparison."""
-        prompt = f"""You are an AI assistant that specializes in comparing and contrasting information across multiple documents.
-
-Please compare the information from the different documents provided in the context below, focusing on the specific question asked.
-
-CONTEXT FROM MULTIPLE DOCUMENTS:
-{context}
-
-COMPARISON QUESTION: {question}
-
-INSTRUCTIONS:
-- Compare and contrast the information from each document
-- Highlight similarities and differences
-- Point out any contradictions or complementary information
-- Reference specific documents and pages
-- If any document lacks relevant information, mention this
-- Provide a balanced analysis based on the available content
-- Structure your response with clear sections:
-  1. Similarities
-  2. Differences
-  3. Key Insights
-- Use bullet points for clarity where appropriate
-
-COMPARISON ANALYSIS:"""
-
-        return prompt
+        return COMPARISON_PROMPT_TEMPLATE.format(context=context, question=question)
     
     def _format_sources(self, chunks: List[Dict]) -> List[Dict]:
         """Format source chunks for response."""
@@ -452,7 +686,6 @@ COMPARISON ANALYSIS:"""
 
 # Example usage
 if __name__ == "__main__":
-    from .vector_store import VectorStore
     from .llm_client import GroqClient
     
     # Initialize components
@@ -1,29 +1,178 @@
 """
 Vector store service using FAISS for similarity search and SentenceTransformers for embeddings.
 """
+import asyncio
 import numpy as np
 import faiss
+import torch
+import functools
 import pickle
 import os
-from typing import List, Dict, Tuple, Optional
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Callable, Hashable, Iterable, List, Dict, Tuple, Optional
 from sentence_transformers import SentenceTransformer
 import json
+import logging
+import re
+
+try:
+    from datasketch import MinHash
+    DATASKETCH_AVAILABLE = True
+except ImportError:
+    DATASKETCH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Word characters runs, matching the query keyword tokenizer in the RAG engine
+TERM_PATTERN = re.compile(r'\w+')
+
+# Permutations per chunk MinHash signature; Jaccard estimates are within ~0.1
+MINHASH_NUM_PERM = 64
+
+# Index types that compress vectors and must be trained on a sample before use
+QUANTIZED_INDEX_TYPES = ('sq8', 'ivfpq')
+# Vectors collected before training; IVF needs ~39 points per list to train well
+DEFAULT_TRAIN_SIZE = {'sq8': 1000, 'ivfpq': 40 * 1024}
+IVFPQ_FACTORY = "IVF1024,PQ48"
+IVF_NPROBE = 16
+# Share of an HNSW graph that may be removed vectors before it is rebuilt without them
+HNSW_COMPACT_FRACTION = 0.25
+# Filtered searches over at most this many vectors score them all exactly instead of
+# traversing the index, where a selective filter cuts the graph walk short
+EXACT_FILTER_MAX = 4096
+_faiss_configured = False
+
+SQLITE_SCHEMA = """
+CREATE TABLE store (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE documents (document_id TEXT PRIMARY KEY, metadata_json TEXT, chunk_count INTEGER);
+CREATE TABLE positions (position INTEGER PRIMARY KEY, chunk_id TEXT);
+CREATE TABLE chunks (
+    chunk_id TEXT PRIMARY KEY,
+    document_id TEXT,
+    text TEXT,
+    metadata_json TEXT,
+    chunk_index INTEGER,
+    minhash BLOB
+);
+"""
+
+def _configure_faiss():
+    """Let FAISS use every core and log the SIMD level of its build, once per process."""
+    global _faiss_configured
+    if _faiss_configured:
+        return
+    _faiss_configured = True
+    
+    # An explicit OMP_NUM_THREADS wins
+    if 'OMP_NUM_THREADS' not in os.environ:
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
+    
+    compile_options = faiss.get_compile_options() if hasattr(faiss, 'get_compile_options') else ''
+    logger.info("FAISS compile options: %s", compile_options or 'unknown')
+    if 'AVX512' not in compile_options:
+        logger.info("FAISS is not using AVX-512; distance scans are faster with an AVX-512 build "
+                    "on CPUs that support it")
 
 class VectorStore:
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", dimension: int = 384):
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", dimension: int = 384,
+                 index_type: str = "hnsw", hnsw_m: int = 32, ef_construction: int = 200,
+                 ef_search: int = 64, batch_size: int = 128, train_size: Optional[int] = None,
+                 keep_raw_vectors: bool = False):
         """
         Initialize vector store with FAISS index and SentenceTransformers model.
         
         Args:
             embedding_model: Name of the SentenceTransformers model
             dimension: Dimension of the embedding vectors
+            index_type: "hnsw" for approximate graph search, "flat" for exact brute force,
+                "hnsw_fp16"/"flat_fp16" for the same with vectors stored as fp16,
+                "sq8" for int8 scalar quantization, "ivfpq" for IVF with product quantization
+            hnsw_m: Neighbors per HNSW graph node (higher = better recall, more memory)
+            ef_construction: HNSW build-time search depth (higher = better graph, slower adds)
+            ef_search: HNSW query-time search depth (higher = better recall, slower queries)
+            batch_size: Chunks per encoder forward pass when adding documents
+            train_size: Vectors to collect before training a quantized index
+            keep_raw_vectors: Keep an FP32 copy of every vector so an HNSW index, which
+                can't remove vectors itself, is rebuilt from exact vectors right after each
+                removal. Without it the graph is rebuilt from its own stored vectors once
+                removed ones make up HNSW_COMPACT_FRACTION of it
         """
-        self.embedding_model = SentenceTransformer(embedding_model)
+        _configure_faiss()
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.embedding_model = SentenceTransformer(embedding_model, device=device)
+        if device == 'cuda':
+            # FP16 halves memory traffic on GPU; cosine ranking is unaffected
+            self.embedding_model.half()
+        self.batch_size = batch_size
         self.dimension = dimension
-        self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.train_size = train_size or DEFAULT_TRAIN_SIZE.get(index_type, 0)
+        # Quantized indexes start out exact and are trained once train_size vectors exist
+        base_index = faiss.IndexFlatIP(dimension) if index_type in QUANTIZED_INDEX_TYPES else self._create_index()
+        self.index = self._with_ids(base_index)
+        self._raw_vectors: Optional[List[np.ndarray]] = [] if keep_raw_vectors else None
         self.documents = {}  # Store document metadata
         self.chunks = {}     # Store chunk content and metadata
         self.chunk_counter = 0
+        self._chunk_id_by_pos: List[str] = []  # Chunk ID for each FAISS index position
+        self._positions_by_doc: Dict[str, np.ndarray] = {}  # FAISS index positions of each document
+        # Positions of removed chunks still in an HNSW graph, which can't delete vectors
+        self._removed_positions = np.empty(0, dtype='int64')
+        self.revision = 0    # Bumped on every change so caches can detect stale results
+        self.read_only = False  # Set by load(mmap=True)
+        # Repeated query strings (retries, comparisons) skip the encoder
+        self._cached_query_embedding = functools.lru_cache(maxsize=4096)(self._encode_query)
+    
+    def _create_index(self) -> faiss.Index:
+        """Create an empty FAISS index; inner product on normalized vectors gives cosine similarity."""
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+            index.hnsw.efSearch = self.ef_search
+            return index
+        if self.index_type == "hnsw_fp16":
+            # fp16 halves the bytes each distance computation reads, with negligible recall loss
+            index = faiss.IndexHNSWSQ(self.dimension, faiss.ScalarQuantizer.QT_fp16, self.hnsw_m,
+                                      faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+            index.hnsw.efSearch = self.ef_search
+            return index
+        if self.index_type == "flat":
+            return faiss.IndexFlatIP(self.dimension)
+        if self.index_type == "flat_fp16":
+            return faiss.IndexScalarQuantizer(self.dimension, faiss.ScalarQuantizer.QT_fp16,
+                                              faiss.METRIC_INNER_PRODUCT)
+        if self.index_type == "sq8":
+            return faiss.IndexScalarQuantizer(self.dimension, faiss.ScalarQuantizer.QT_8bit,
+                                              faiss.METRIC_INNER_PRODUCT)
+        if self.index_type == "ivfpq":
+            index = faiss.index_factory(self.dimension, IVFPQ_FACTORY, faiss.METRIC_INNER_PRODUCT)
+            faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+            return index
+        raise ValueError(f"Unsupported index type: {self.index_type}")
+    
+    def _with_ids(self, index: faiss.Index) -> faiss.Index:
+        """
+        Wrap an index that supports removal in an ID map.
+        
+        Vectors are added with their position in `_chunk_id_by_pos` as ID, so
+        removing some never renumbers the rest.
+        """
+        if isinstance(index, faiss.IndexHNSW):
+            return index
+        return faiss.IndexIDMap2(index)
+    
+    def _base_index(self) -> faiss.Index:
+        """The index that stores the vectors, unwrapped from its ID map."""
+        if isinstance(self.index, faiss.IndexIDMap):
+            return faiss.downcast_index(self.index.index)
+        return self.index
     
     def add_document(self, document_id: str, chunks: List[Dict], document_metadata: Dict = None):
         """
@@ -34,6 +183,8 @@ class VectorStore:
             chunks: List of text chunks with metadata
             document_metadata: Additional document metadata
         """
+        self._check_writable()
+        
         # Store document metadata
         self.documents[document_id] = {
             'metadata': document_metadata if document_metadata is not None else {},
@@ -48,33 +199,117 @@ class VectorStore:
         for chunk in chunks:
             chunk_id = f"{document_id}_{self.chunk_counter}"
             self.chunk_counter += 1
+            token_fields = self._token_fields(chunk['text'])
             
-            # Store chunk data
+            # Store chunk data, tokenized once here so queries don't have to
             self.chunks[chunk_id] = {
                 'document_id': document_id,
                 'text': chunk['text'],
                 'metadata': chunk,
-                'chunk_index': len(texts)
+                'chunk_index': len(texts),
+                'minhash': self._minhash_signature(token_fields['_word_set']),
+                **token_fields
             }
             
             texts.append(chunk['text'])
             chunk_ids.append(chunk_id)
             
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(texts, convert_to_tensor=False)
-        embeddings = np.array(embeddings).astype('float32')
-        
-        # Normalize for cosine similarity
-        faiss.normalize_L2(embeddings)
+        # Generate embeddings, normalized by the encoder for cosine similarity
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype('float32')
         
         # Add to FAISS index
-        self.index.add(embeddings)
+        start = len(self._chunk_id_by_pos)
+        self._add_vectors(embeddings)
+        self._chunk_id_by_pos.extend(chunk_ids)
+        self._positions_by_doc[document_id] = np.arange(start, start + len(chunk_ids), dtype='int64')
         
         # Update document metadata
         self.documents[document_id]['chunk_ids'].extend(chunk_ids)
+        self.revision += 1
         
         return len(texts)
     
+    def _check_writable(self):
+        """Raise before a change to a store that was loaded read-only."""
+        if self.read_only:
+            raise RuntimeError("Vector store was loaded with mmap=True and is read-only; "
+                               "load it without mmap to modify it")
+    
+    def _add_vectors(self, embeddings: np.ndarray):
+        """Append vectors to the index, training a quantized index once enough are collected."""
+        if isinstance(self.index, faiss.IndexIDMap):
+            start = len(self._chunk_id_by_pos)
+            self.index.add_with_ids(embeddings, np.arange(start, start + len(embeddings), dtype='int64'))
+        else:
+            self.index.add(embeddings)
+        if self._raw_vectors is not None:
+            self._raw_vectors.append(embeddings)
+        
+        if self._awaiting_training() and self.index.ntotal >= self.train_size:
+            staging_index = self._base_index()
+            vectors = staging_index.reconstruct_n(0, staging_index.ntotal)
+            ids = faiss.vector_to_array(self.index.id_map)
+            index = self._create_index()
+            index.train(vectors)
+            self.index = self._with_ids(index)
+            self.index.add_with_ids(vectors, ids)
+    
+    def _awaiting_training(self) -> bool:
+        """Whether a quantized index is still being served by its exact staging index."""
+        return self.index_type in QUANTIZED_INDEX_TYPES and isinstance(self._base_index(), faiss.IndexFlat)
+    
+    def _token_fields(self, text: str) -> Dict[str, Any]:
+        """Tokenized forms of a chunk's text that the RAG engine reuses at query time."""
+        lower = text.lower()
+        words = lower.split()
+        return {
+            '_word_set': frozenset(words),
+            '_length': len(words),
+            '_terms': frozenset(TERM_PATTERN.findall(lower))
+        }
+    
+    def _minhash_signature(self, words: Iterable[str]) -> Optional[np.ndarray]:
+        """
+        Compute a MinHash signature of a chunk's lowercased words, if datasketch is available.
+        
+        The share of equal entries between two signatures estimates the Jaccard
+        similarity of their word sets.
+        """
+        if not DATASKETCH_AVAILABLE:
+            return None
+        minhash = MinHash(num_perm=MINHASH_NUM_PERM)
+        minhash.update_batch([word.encode('utf8') for word in set(words)])
+        return minhash.hashvalues
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed a query for use with `search_by_vector`.
+        
+        Embeddings are cached by query text, so the returned array is shared
+        and read-only; copy it before modifying.
+        
+        Args:
+            query: Search query text
+            
+        Returns:
+            L2-normalized float32 array of shape (1, dimension)
+        """
+        return self._cached_query_embedding(query)
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Encode and normalize a query, returning a read-only array."""
+        query_embedding = self.embedding_model.encode([query], convert_to_tensor=False)
+        query_embedding = np.array(query_embedding).astype('float32')
+        faiss.normalize_L2(query_embedding)
+        query_embedding.setflags(write=False)
+        return query_embedding
+    
     def search(self, query: str, k: int = 5, document_ids: Optional[List[str]] = None) -> List[Dict]:
         """
         Search for similar chunks based on query.
@@ -87,27 +322,191 @@ class VectorStore:
         Returns:
             List of search results with scores and metadata
         """
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query], convert_to_tensor=False)
-        query_embedding = np.array(query_embedding).astype('float32')
-        faiss.normalize_L2(query_embedding)
+        return self.search_by_vector(self.embed_query(query), k, document_ids)
+    
+    def search_by_vector(self, query_embedding: np.ndarray, k: int = 5,
+                         document_ids: Optional[List[str]] = None,
+                         score_threshold: Optional[float] = None,
+                         min_text_length: Optional[int] = None) -> List[Dict]:
+        """
+        Search for similar chunks using a precomputed query embedding.
+        
+        Args:
+            query_embedding: Normalized query embedding from `embed_query`
+            k: Number of results to return
+            document_ids: Optional list to filter by specific documents
+            score_threshold: Optional minimum similarity score
+            min_text_length: Optional minimum chunk length in characters
+            
+        Returns:
+            List of search results with scores and metadata
+        """
+        allowed_positions = self._allowed_positions(document_ids)
+        if self.index.ntotal == 0 or (allowed_positions is not None and len(allowed_positions) == 0):
+            return []
+        
+        scores, indices = self._search(query_embedding, k, allowed_positions)
+        
+        return self._collect_results(scores[0], indices[0], k, score_threshold, min_text_length)
+    
+    async def asearch(self, query: str, k: int = 5, document_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Async variant of `search`; the search runs in a worker thread."""
+        return await asyncio.to_thread(self.search, query, k, document_ids)
+    
+    async def asearch_by_vector(self, query_embedding: np.ndarray, k: int = 5,
+                                document_ids: Optional[List[str]] = None,
+                                score_threshold: Optional[float] = None,
+                                min_text_length: Optional[int] = None) -> List[Dict]:
+        """
+        Async variant of `search_by_vector`.
+        
+        FAISS releases the GIL and index reads are thread-safe, so concurrent
+        calls search in parallel.
+        """
+        return await asyncio.to_thread(self.search_by_vector, query_embedding, k, document_ids,
+                                       score_threshold, min_text_length)
+    
+    def search_batch(self, queries: List[str], k: int = 5,
+                     document_ids: Optional[List[str]] = None) -> List[List[Dict]]:
+        """
+        Search for several queries with one encoder pass and one FAISS search.
+        
+        Args:
+            queries: Search query texts
+            k: Number of results to return per query
+            document_ids: Optional list to filter by specific documents
+            
+        Returns:
+            One list of search results per query, in the same order
+        """
+        allowed_positions = self._allowed_positions(document_ids)
+        if self.index.ntotal == 0 or (allowed_positions is not None and len(allowed_positions) == 0):
+            return [[] for _ in queries]
+        
+        query_embeddings = self.embedding_model.encode(queries, convert_to_tensor=False)
+        query_embeddings = np.array(query_embeddings).astype('float32')
+        faiss.normalize_L2(query_embeddings)
         
-        # Search in FAISS
-        scores, indices = self.index.search(query_embedding, min(k * 2, self.index.ntotal))  # Get more results for filtering
+        scores, indices = self._search(query_embeddings, k, allowed_positions)
+        
+        return [
+            self._collect_results(query_scores, query_indices, k)
+            for query_scores, query_indices in zip(scores, indices)
+        ]
+    
+    def _allowed_positions(self, document_ids: Optional[List[str]]) -> Optional[np.ndarray]:
+        """Get the FAISS index positions belonging to the given documents, or None for no filter."""
+        if not document_ids:
+            return None
+        positions = [self._positions_by_doc[doc_id] for doc_id in document_ids if doc_id in self._positions_by_doc]
+        return np.concatenate(positions) if positions else np.empty(0, dtype='int64')
+    
+    def _search(self, query_embeddings: np.ndarray, k: int,
+                allowed_positions: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the nearest live vectors at the allowed positions for each query.
         
-        # Process results
+        Returns FAISS-style score and position arrays of shape (queries, fetch size).
+        """
+        fetch_size = self._fetch_size(k, allowed_positions)
+        if allowed_positions is not None and len(allowed_positions) <= EXACT_FILTER_MAX:
+            vectors = self._reconstruct(allowed_positions)
+            if vectors is not None:
+                scores = query_embeddings @ vectors.T
+                top = np.argsort(-scores, axis=1, kind='stable')[:, :fetch_size]
+                return np.take_along_axis(scores, top, axis=1), allowed_positions[top]
+        
+        # Skip vectors that don't qualify during the scan
+        return self.index.search(query_embeddings, fetch_size, params=self._search_params(allowed_positions))
+    
+    def _reconstruct(self, positions: np.ndarray) -> Optional[np.ndarray]:
+        """Vectors at the given positions, or None if the index can't reconstruct them."""
+        if self._raw_vectors:
+            # Snapshot the blocks; searches stay read-only while add_document appends
+            blocks = list(self._raw_vectors)
+            if len(blocks) == 1:
+                return blocks[0][positions]
+            offsets = np.cumsum([0] + [len(block) for block in blocks])
+            block_ids = np.searchsorted(offsets, positions, side='right') - 1
+            vectors = np.empty((len(positions), self.dimension), dtype='float32')
+            for block_id in np.unique(block_ids):
+                rows = block_ids == block_id
+                vectors[rows] = blocks[block_id][positions[rows] - offsets[block_id]]
+            return vectors
+        try:
+            return self.index.reconstruct_batch(positions)
+        except RuntimeError:  # IVF indexes without a direct map
+            return None
+    
+    def _candidate_count(self, allowed_positions: Optional[np.ndarray]) -> int:
+        """Number of live vectors a search can return."""
+        if allowed_positions is not None:
+            return len(allowed_positions)
+        return self.index.ntotal - len(self._removed_positions)
+    
+    def _fetch_size(self, k: int, allowed_positions: Optional[np.ndarray]) -> int:
+        """Number of neighbors to request from FAISS, with headroom for the threshold and length filters."""
+        return min(k * 2, self._candidate_count(allowed_positions))
+    
+    def _search_params(self, allowed_positions: Optional[np.ndarray]) -> Optional[faiss.SearchParameters]:
+        """
+        FAISS search parameters restricting a search to live vectors at the allowed positions.
+        
+        Filtering happens inside the search rather than on a fixed window of
+        results, so vectors that don't qualify can't crowd out ones that do.
+        """
+        if allowed_positions is not None:
+            selector = faiss.IDSelectorBatch(len(allowed_positions), faiss.swig_ptr(allowed_positions))
+            referenced_objects = [selector]
+        elif len(self._removed_positions):
+            removed = faiss.IDSelectorBatch(len(self._removed_positions), faiss.swig_ptr(self._removed_positions))
+            selector = faiss.IDSelectorNot(removed)
+            referenced_objects = [removed, selector]
+        else:
+            return None
+        
+        # HNSW and IVF reject plain SearchParameters and would otherwise fall back to default search depths
+        base_index = self._base_index()
+        if isinstance(base_index, faiss.IndexHNSW):
+            # Filtered-out nodes still take up slots in the candidate queue, so widen it by the
+            # share of vectors that can't be returned
+            ef_search = self._scaled_search_depth(base_index.hnsw.efSearch, allowed_positions)
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+        elif isinstance(base_index, faiss.IndexIVF):
+            # Probe more lists when few vectors qualify, or they may all sit in unprobed ones
+            nprobe = min(self._scaled_search_depth(base_index.nprobe, allowed_positions), base_index.nlist)
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        # The parameters only hold pointers to the selectors
+        params.referenced_objects = referenced_objects
+        return params
+    
+    def _scaled_search_depth(self, depth: int, allowed_positions: Optional[np.ndarray]) -> int:
+        """Scale a search depth by how selective a filter is, capped at the index size."""
+        candidates = max(self._candidate_count(allowed_positions), 1)
+        return min(-(-depth * self.index.ntotal // candidates), max(self.index.ntotal, depth))
+    
+    def _collect_results(self, scores: np.ndarray, indices: np.ndarray, k: int,
+                         score_threshold: Optional[float] = None,
+                         min_text_length: Optional[int] = None) -> List[Dict]:
+        """Turn one query's FAISS scores and indices into search results."""
         results = []
-        chunk_id_list = list(self.chunks.keys())
         
-        for score, idx in zip(scores[0], indices[0]):
+        for score, idx in zip(scores, indices):
             if idx == -1:  # FAISS returns -1 for invalid indices
                 continue
+            
+            # Scores come back in descending order, so nothing after this qualifies
+            if score_threshold is not None and score < score_threshold:
+                break
                 
-            chunk_id = chunk_id_list[idx]
-            chunk_data = self.chunks[chunk_id]
+            chunk_id = self._chunk_id_by_pos[idx]
+            chunk_data = self.chunks.get(chunk_id)
+            if chunk_data is None:  # Chunk of a removed document
+                continue
             
-            # Filter by document IDs if specified
-            if document_ids and chunk_data['document_id'] not in document_ids:
+            if min_text_length is not None and len(chunk_data['text'].strip()) < min_text_length:
                 continue
             
             results.append({
@@ -115,7 +514,11 @@ class VectorStore:
                 'document_id': chunk_data['document_id'],
                 'text': chunk_data['text'],
                 'score': float(score),
-                'metadata': chunk_data['metadata']
+                'metadata': chunk_data['metadata'],
+                'minhash': chunk_data.get('minhash'),
+                '_word_set': chunk_data.get('_word_set'),
+                '_length': chunk_data.get('_length'),
+                '_terms': chunk_data.get('_terms')
             })
             
             if len(results) >= k:
@@ -140,6 +543,7 @@ class VectorStore:
     
     def remove_document(self, document_id: str):
         """Remove a document and all its chunks from the vector store."""
+        self._check_writable()
         if document_id not in self.documents:
             return False
         
@@ -152,41 +556,232 @@ class VectorStore:
         
         # Remove document
         del self.documents[document_id]
+        positions = self._positions_by_doc.pop(document_id, None)
+        self.revision += 1
         
-        # Note: FAISS doesn't support efficient deletion, so we'd need to rebuild the index
-        # For production, consider using a database or more sophisticated vector store
+        if positions is None or not len(positions):
+            return True
+        if isinstance(self.index, faiss.IndexIDMap):
+            self.index.remove_ids(positions)
+        else:
+            # The vectors stay in the HNSW graph; searches exclude them until the index is rebuilt
+            self._removed_positions = np.union1d(self._removed_positions, positions)
+            if (self._raw_vectors is not None
+                    or len(self._removed_positions) >= HNSW_COMPACT_FRACTION * self.index.ntotal):
+                self._rebuild_index()
         
         return True
     
+    def _rebuild_index(self):
+        """Re-add the vectors of the remaining chunks, compacting index positions."""
+        keep = [pos for pos, chunk_id in enumerate(self._chunk_id_by_pos) if chunk_id in self.chunks]
+        if self._raw_vectors is not None:
+            vectors = np.concatenate(self._raw_vectors) if self._raw_vectors else np.empty((0, self.dimension), dtype='float32')
+        else:
+            # HNSW storage reconstructs its vectors, exactly for flat and fp16-rounded for hnsw_fp16
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        vectors = vectors[keep]
+        
+        # reset() drops the vectors but keeps any trained quantizer
+        self.index.reset()
+        if len(vectors):
+            self.index.add(vectors)
+        if self._raw_vectors is not None:
+            self._raw_vectors = [vectors]
+        self._chunk_id_by_pos = [self._chunk_id_by_pos[pos] for pos in keep]
+        self._positions_by_doc = self._build_positions_by_doc()
+        self._removed_positions = np.empty(0, dtype='int64')
+    
     def save(self, filepath: str):
-        """Save the vector store to disk."""
+        """
+        Save the vector store to disk.
+        
+        Writes the FAISS index to `<filepath>.faiss`, documents and chunks to the
+        SQLite database `<filepath>.db` and, if kept, raw vectors to `<filepath>.npy`.
+        """
         # Save FAISS index
         faiss.write_index(self.index, f"{filepath}.faiss")
         
-        # Save metadata
-        metadata = {
-            'documents': self.documents,
-            'chunks': self.chunks,
-            'chunk_counter': self.chunk_counter,
-            'dimension': self.dimension
-        }
+        # Write metadata to a fresh database and swap it in, so a failed save
+        # leaves the previous one intact
+        db_path = f"{filepath}.db"
+        tmp_path = f"{db_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         
-        with open(f"{filepath}.pkl", 'wb') as f:
-            pickle.dump(metadata, f)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(SQLITE_SCHEMA)
+            conn.executemany(
+                "INSERT INTO store VALUES (?, ?)",
+                [
+                    ('chunk_counter', json.dumps(self.chunk_counter)),
+                    ('dimension', json.dumps(self.dimension)),
+                    ('index_type', json.dumps(self.index_type)),
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO documents VALUES (?, ?, ?)",
+                (
+                    (doc_id, json.dumps(document['metadata']), document['chunk_count'])
+                    for doc_id, document in self.documents.items()
+                )
+            )
+            conn.executemany(
+                "INSERT INTO positions VALUES (?, ?)",
+                enumerate(self._chunk_id_by_pos)
+            )
+            conn.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        chunk_id,
+                        chunk['document_id'],
+                        chunk['text'],
+                        json.dumps(chunk['metadata']),
+                        chunk['chunk_index'],
+                        chunk['minhash'].astype(np.uint64).tobytes() if chunk.get('minhash') is not None else None
+                    )
+                    for chunk_id, chunk in self.chunks.items()
+                )
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, db_path)
+        
+        if self._raw_vectors:
+            np.save(f"{filepath}.npy", np.concatenate(self._raw_vectors))
     
-    def load(self, filepath: str):
-        """Load the vector store from disk."""
+    def load(self, filepath: str, mmap: bool = False):
+        """
+        Load the vector store from disk.
+        
+        Args:
+            filepath: Path the store was saved to, without extension
+            mmap: Serve the store read-only and read chunks from the database on
+                demand. Raw vectors and, for stores saved as "ivfpq", the inverted
+                lists are memory-mapped, so worker processes loading the same store
+                share one copy through the OS page cache. FAISS can only map IVF
+                lists: HNSW, flat and sq8 indexes are still read fully into each
+                process's memory.
+        """
         # Load FAISS index
-        self.index = faiss.read_index(f"{filepath}.faiss")
+        self.index_type = self._saved_index_type(filepath)
+        io_flags = 0
+        if mmap and self.index_type == "ivfpq":
+            io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        self.index = faiss.read_index(f"{filepath}.faiss", io_flags)
+        if isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = self.ef_search
         
-        # Load metadata
-        with open(f"{filepath}.pkl", 'rb') as f:
+        self.read_only = mmap
+        if os.path.exists(f"{filepath}.db"):
+            self._load_sqlite(f"{filepath}.db", lazy=mmap)
+        else:
+            self._load_pickle(f"{filepath}.pkl")
+            self._positions_by_doc = self._build_positions_by_doc()
+        
+        if isinstance(self.index, faiss.IndexIDMap):
+            self._removed_positions = np.empty(0, dtype='int64')
+        
+        if self._raw_vectors is not None:
+            # Saves without raw vectors can't be compacted; fall back to skipping removed chunks
+            raw_path = f"{filepath}.npy"
+            self._raw_vectors = [np.load(raw_path, mmap_mode='r' if mmap else None)] if os.path.exists(raw_path) else None
+        self.revision += 1
+    
+    def _saved_index_type(self, filepath: str) -> str:
+        """Index type recorded by `save`; older saves fall back to this store's own type."""
+        db_path = f"{filepath}.db"
+        if not os.path.exists(db_path):
+            return self.index_type
+        conn = sqlite3.connect(_readonly_sqlite_uri(db_path), uri=True)
+        try:
+            row = conn.execute("SELECT value FROM store WHERE key = 'index_type'").fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row is not None else self.index_type
+    
+    def _load_sqlite(self, db_path: str, lazy: bool = False):
+        """
+        Load documents and chunks saved by `save`.
+        
+        With `lazy`, chunks stay in the database and are read on demand.
+        """
+        conn = sqlite3.connect(_readonly_sqlite_uri(db_path), uri=True)
+        try:
+            store = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM store")}
+            self.chunk_counter = store['chunk_counter']
+            self.dimension = store['dimension']
+            
+            self.documents = {
+                doc_id: {'metadata': json.loads(metadata), 'chunk_count': chunk_count, 'chunk_ids': []}
+                for doc_id, metadata, chunk_count in conn.execute(
+                    "SELECT document_id, metadata_json, chunk_count FROM documents"
+                )
+            }
+            self._chunk_id_by_pos = [
+                chunk_id for chunk_id, in conn.execute("SELECT chunk_id FROM positions ORDER BY position")
+            ]
+            
+            self.chunks = SQLiteChunks(db_path, self._chunk_from_row) if lazy else {}
+            columns = "document_id, position" if lazy else "document_id, position, text, metadata_json, chunk_index, minhash"
+            rows = conn.execute(
+                f"SELECT chunks.chunk_id, {columns} FROM chunks JOIN positions USING (chunk_id) ORDER BY position"
+            )
+            positions_by_doc = {}
+            for chunk_id, doc_id, position, *chunk_row in rows:
+                if not lazy:
+                    self.chunks[chunk_id] = self._chunk_from_row(doc_id, *chunk_row)
+                self.documents[doc_id]['chunk_ids'].append(chunk_id)
+                positions_by_doc.setdefault(doc_id, []).append(position)
+            self._positions_by_doc = {
+                doc_id: np.array(positions, dtype='int64') for doc_id, positions in positions_by_doc.items()
+            }
+            self._removed_positions = np.array([
+                position for position, in conn.execute(
+                    "SELECT position FROM positions LEFT JOIN chunks USING (chunk_id) "
+                    "WHERE chunks.chunk_id IS NULL ORDER BY position"
+                )
+            ], dtype='int64')
+        finally:
+            conn.close()
+    
+    def _chunk_from_row(self, doc_id: str, text: str, metadata: str, chunk_index: int,
+                        minhash: Optional[bytes]) -> Dict:
+        """Rebuild a chunk's data from its database row."""
+        return {
+            'document_id': doc_id,
+            'text': text,
+            'metadata': json.loads(metadata),
+            'chunk_index': chunk_index,
+            'minhash': np.frombuffer(minhash, dtype=np.uint64) if minhash is not None else None,
+            **self._token_fields(text)
+        }
+    
+    def _load_pickle(self, pkl_path: str):
+        """Load a store saved before metadata moved to SQLite."""
+        with open(pkl_path, 'rb') as f:
             metadata = pickle.load(f)
         
         self.documents = metadata['documents']
         self.chunks = metadata['chunks']
         self.chunk_counter = metadata['chunk_counter']
+        # Older saves predate the position map; chunks were stored in index order
+        self._chunk_id_by_pos = metadata.get('chunk_id_by_pos', list(self.chunks.keys()))
         self.dimension = metadata['dimension']
+        self._removed_positions = np.array([
+            position for position, chunk_id in enumerate(self._chunk_id_by_pos) if chunk_id not in self.chunks
+        ], dtype='int64')
+    
+    def _build_positions_by_doc(self) -> Dict[str, np.ndarray]:
+        """Rebuild the document to index position map from the chunk data."""
+        positions_by_doc = {}
+        for position, chunk_id in enumerate(self._chunk_id_by_pos):
+            if chunk_id in self.chunks:
+                positions_by_doc.setdefault(self.chunks[chunk_id]['document_id'], []).append(position)
+        return {doc_id: np.array(positions, dtype='int64') for doc_id, positions in positions_by_doc.items()}
     
     def get_stats(self) -> Dict:
         """Get statistics about the vector store."""
@@ -194,9 +789,137 @@ class VectorStore:
             'total_documents': len(self.documents),
             'total_chunks': len(self.chunks),
             'index_size': self.index.ntotal,
+            'index_type': self.index_type,
             'dimension': self.dimension
         }
 
+class SQLiteChunks(Mapping):
+    """
+    Read-only mapping of chunk ID to chunk data, backed by a saved store's database.
+    
+    Rows are read on demand and recently used chunks are kept in memory. Saves
+    replace the database file rather than modifying it, so it is opened as
+    immutable and reads need no locking between processes.
+    """
+    
+    def __init__(self, db_path: str, chunk_from_row: Callable[..., Dict], cache_size: int = 4096):
+        """
+        Initialize the mapping.
+        
+        Args:
+            db_path: Path of the database written by `VectorStore.save`
+            chunk_from_row: Builds chunk data from a row's document ID, text,
+                metadata JSON, chunk index and MinHash blob
+            cache_size: Number of chunks kept in memory
+        """
+        # Async searches read from worker threads
+        self._conn = sqlite3.connect(_readonly_sqlite_uri(db_path), uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._chunk_from_row = chunk_from_row
+        self._cached_chunk = functools.lru_cache(maxsize=cache_size)(self._read_chunk)
+    
+    def _read_chunk(self, chunk_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT document_id, text, metadata_json, chunk_index, minhash FROM chunks WHERE chunk_id = ?",
+                (chunk_id,)
+            ).fetchone()
+        return self._chunk_from_row(*row) if row is not None else None
+    
+    def __getitem__(self, chunk_id: str) -> Dict:
+        chunk = self._cached_chunk(chunk_id)
+        if chunk is None:
+            raise KeyError(chunk_id)
+        return chunk
+    
+    def __iter__(self):
+        with self._lock:
+            chunk_ids = [chunk_id for chunk_id, in self._conn.execute("SELECT chunk_id FROM chunks")]
+        return iter(chunk_ids)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+def _readonly_sqlite_uri(db_path: str) -> str:
+    """SQLite URI opening a saved store's database read-only without locking."""
+    return Path(db_path).absolute().as_uri() + "?mode=ro&immutable=1"
+
+class ProximityCache:
+    """
+    Approximate cache of search results keyed by query embedding.
+    
+    A lookup hits when a cached query embedding is at least
+    `similarity_threshold` similar (inner product of normalized vectors) to the
+    new one and was stored under the same scope, so near-duplicate questions
+    skip the search entirely. The least recently used entry is evicted once
+    `capacity` is reached.
+    """
+    
+    def __init__(self, dimension: int, similarity_threshold: float = 0.95, capacity: int = 256):
+        """
+        Initialize the cache.
+        
+        Args:
+            dimension: Dimension of the query embeddings
+            similarity_threshold: Minimum similarity for a cached query to match
+            capacity: Maximum number of cached queries
+        """
+        self.similarity_threshold = similarity_threshold
+        self.capacity = capacity
+        self._vectors = np.zeros((capacity, dimension), dtype='float32')
+        self._entries: List[Optional[Tuple[Hashable, List[Dict]]]] = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def lookup(self, query_embedding: np.ndarray, scope: Hashable) -> Optional[List[Dict]]:
+        """
+        Find cached results for a similar query stored under the same scope.
+        
+        Args:
+            query_embedding: Normalized query embedding of shape (1, dimension)
+            scope: Anything else the results depend on (filters, k, store revision)
+            
+        Returns:
+            Copies of the cached results, or None on a miss
+        """
+        with self._lock:
+            if self._size == 0:
+                return None
+            
+            similarities = self._vectors[:self._size] @ query_embedding.ravel()
+            candidates = np.flatnonzero(similarities >= self.similarity_threshold)
+            for slot in candidates[np.argsort(-similarities[candidates])]:
+                entry_scope, results = self._entries[slot]
+                if entry_scope == scope:
+                    self._clock += 1
+                    self._last_used[slot] = self._clock
+                    return [dict(result) for result in results]
+            
+            return None
+    
+    def insert(self, query_embedding: np.ndarray, scope: Hashable, results: List[Dict]):
+        """Cache search results for a query, evicting the least recently used entry if full."""
+        with self._lock:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            
+            self._vectors[slot] = query_embedding.ravel()
+            self._entries[slot] = (scope, [dict(result) for result in results])
+            self._clock += 1
+            self._last_used[slot] = self._clock
+    
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries = [None] * self.capacity
+            self._size = 0
+
 class MultiModalVectorStore:
     """Extended vector store that handles both text and image embeddings."""
     
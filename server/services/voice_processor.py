@@ -3,106 +3,456 @@ Voice processing service for speech-to-text and text-to-speech functionality.
 """
 import os
 import io
+import platform
+import asyncio
+import atexit
 import base64
+import contextlib
+import functools
+import hashlib
+import importlib
+import importlib.util
+import queue
+import re
+import struct
 import tempfile
-import subprocess
-from typing import Optional, Union, Dict
-from pathlib import Path
+import threading
 import wave
-import json
-from typing import List
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Union, Dict
+import numpy as np
 
 
-# Try to import optional dependencies
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
+class _LazyModule:
+    """Stand-in for an optional module that imports it on first attribute access."""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+def _remove_file(path: str):
+    """Delete a file that may already be gone, e.g. after /dev/shm was cleaned."""
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+def _installed(*names: str) -> bool:
+    """Check that top-level packages are installed without importing them."""
+    return all(importlib.util.find_spec(name) is not None for name in names)
+
+# Optional dependencies are probed without importing them; torch alone takes
+# hundreds of milliseconds, so they're only imported on the code paths that need them
+faster_whisper = _LazyModule("faster_whisper")
+ctranslate2 = _LazyModule("ctranslate2")  # faster-whisper's inference engine
+pywhispercpp_model = _LazyModule("pywhispercpp.model")
+whisper = _LazyModule("whisper")
+onnxruntime = _LazyModule("onnxruntime")
+optimum_onnxruntime = _LazyModule("optimum.onnxruntime")
+transformers = _LazyModule("transformers")
+torch = _LazyModule("torch")
+pyttsx3 = _LazyModule("pyttsx3")
+gtts = _LazyModule("gtts")
+requests = _LazyModule("requests")
+soundfile = _LazyModule("soundfile")
+scipy_signal = _LazyModule("scipy.signal")
+
+WHISPER_CPP_AVAILABLE = _installed("pywhispercpp")
+FASTER_WHISPER_AVAILABLE = _installed("faster_whisper")
+WHISPER_AVAILABLE = _installed("whisper")
+ONNX_WHISPER_AVAILABLE = _installed("onnxruntime", "optimum", "transformers")
+TORCH_AVAILABLE = _installed("torch")
+PYTTSX3_AVAILABLE = _installed("pyttsx3")
+GTTS_AVAILABLE = _installed("gtts")
+REQUESTS_AVAILABLE = _installed("requests")
+SOUNDFILE_AVAILABLE = _installed("soundfile")
+SCIPY_AVAILABLE = _installed("scipy")
 
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
-except ImportError:
-    PYTTSX3_AVAILABLE = False
+# Whisper implementation: "auto" loads the first installed one, in WHISPER_BACKENDS order
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "auto").strip().lower()
+WHISPER_BACKENDS = ("whisper.cpp", "faster-whisper", "onnxruntime", "openai-whisper")
+WHISPER_BACKEND_AVAILABLE = {
+    "whisper.cpp": WHISPER_CPP_AVAILABLE,
+    "faster-whisper": FASTER_WHISPER_AVAILABLE,
+    "onnxruntime": ONNX_WHISPER_AVAILABLE,
+    "openai-whisper": WHISPER_AVAILABLE,
+}
+CPU_ONLY_WHISPER_BACKENDS = ("whisper.cpp", "onnxruntime")
+# Whisper checkpoint; unset picks turbo on CUDA (large-v3 accuracy, 4 decoder layers) and base on CPU
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE")
+# Names openai-whisper and faster-whisper accept that Hugging Face and whisper.cpp spell out
+WHISPER_MODEL_ALIASES = {"turbo": "large-v3-turbo"}
+# Same download directory openai-whisper uses, so GGML and PyTorch checkpoints live together
+WHISPER_CACHE_DIR = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "whisper")
+WHISPER_SAMPLE_RATE = 16000  # Whisper models expect 16 kHz mono audio
+WHISPER_WINDOW_SAMPLES = 30 * WHISPER_SAMPLE_RATE  # Audio Whisper encodes in one pass
+STT_MAX_BATCH = 8  # Clips transcribed together by speech_to_text_async
+STT_BATCH_DELAY = 0.02  # Seconds to wait for more clips before running a batch
+DATA_URL_HEADER_MAX = 256  # Longest data: URL header scanned for the base64 comma
+CLOUD_METHODS = ("google", "azure")
+HTTP_MAX_WORKERS = 16  # Concurrent cloud STT/TTS requests, also the connection pool size
+TTS_CACHE_SIZE = 128  # Synthesized results kept for repeated phrases
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')  # Split points for streamed pyttsx3 synthesis
+STREAMING_WAV_SIZE = 0xFFFFFFFF  # RIFF/data size for WAV streams of unknown length
+# RAM-backed tmpfs for files that APIs insist on reading/writing by path
+SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
 
-try:
-    from gtts import gTTS
-    GTTS_AVAILABLE = True
-except ImportError:
-    GTTS_AVAILABLE = False
+# gTTS supports many languages
+GTTS_VOICES = (
+    {"id": "en", "name": "English", "language": "en"},
+    {"id": "es", "name": "Spanish", "language": "es"},
+    {"id": "fr", "name": "French", "language": "fr"},
+    {"id": "de", "name": "German", "language": "de"},
+    {"id": "it", "name": "Italian", "language": "it"},
+)
 
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
+class _WhisperCache:
+    """Whisper models loaded in this process, shared by every VoiceProcessor."""
+    _models: Dict[tuple, Any] = {}
+    _inference_locks: Dict[tuple, threading.Lock] = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get(cls, backend: str, model_size: str, device: str, load: Callable[[], Any]) -> Any:
+        """Return the cached model for this configuration, calling `load` only the first time."""
+        key = (backend, model_size, device)
+        with cls._lock:
+            if key not in cls._models:
+                cls._models[key] = load()
+            return cls._models[key]
+    
+    @classmethod
+    def inference_lock(cls, backend: str, model_size: str, device: str) -> threading.Lock:
+        """Return the lock that serializes inference on this configuration's model."""
+        with cls._lock:
+            return cls._inference_locks.setdefault((backend, model_size, device), threading.Lock())
+
+class _OnnxWhisper:
+    """Whisper exported to ONNX with int8 weights, run on ONNX Runtime's CPU kernels."""
+    
+    ONNX_GRAPHS = ("encoder_model", "decoder_model", "decoder_with_past_model")
+    
+    def __init__(self, model_size: str):
+        model_id = f"openai/whisper-{WHISPER_MODEL_ALIASES.get(model_size, model_size)}"
+        model_dir = os.path.join(WHISPER_CACHE_DIR, f"onnx-{model_size}-int8")
+        if not all(os.path.exists(os.path.join(model_dir, f"{name}_quantized.onnx")) for name in self.ONNX_GRAPHS):
+            self._export(model_id, model_dir)
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count() or 1
+        
+        self.processor = transformers.WhisperProcessor.from_pretrained(model_dir)
+        self.model = optimum_onnxruntime.ORTModelForSpeechSeq2Seq.from_pretrained(
+            model_dir,
+            encoder_file_name="encoder_model_quantized.onnx",
+            decoder_file_name="decoder_model_quantized.onnx",
+            decoder_with_past_file_name="decoder_with_past_model_quantized.onnx",
+            provider="CPUExecutionProvider",
+            session_options=options
+        )
+    
+    @classmethod
+    def _export(cls, model_id: str, model_dir: str):
+        """Export the checkpoint to ONNX once and dynamically quantize each graph to int8."""
+        optimum_onnxruntime.ORTModelForSpeechSeq2Seq.from_pretrained(model_id, export=True).save_pretrained(model_dir)
+        transformers.WhisperProcessor.from_pretrained(model_id).save_pretrained(model_dir)
+        
+        # Only MatMul (the Linear layers): the CPU provider has no ConvInteger kernel for the conv stem
+        quantization_configs = optimum_onnxruntime.AutoQuantizationConfig
+        quantize = quantization_configs.arm64 if platform.machine().lower() in ("arm64", "aarch64") \
+            else quantization_configs.avx512_vnni
+        config = quantize(is_static=False, per_channel=False, operators_to_quantize=["MatMul"])
+        for name in cls.ONNX_GRAPHS:
+            quantizer = optimum_onnxruntime.ORTQuantizer.from_pretrained(model_dir, file_name=f"{name}.onnx")
+            quantizer.quantize(save_dir=model_dir, quantization_config=config)
+    
+    def transcribe(self, audio: np.ndarray) -> str:
+        """Transcribe 16 kHz samples, decoding each 30 second window as one batch."""
+        windows = [
+            audio[start:start + WHISPER_WINDOW_SAMPLES]
+            for start in range(0, max(len(audio), 1), WHISPER_WINDOW_SAMPLES)
+        ]
+        features = self.processor(windows, sampling_rate=WHISPER_SAMPLE_RATE, return_tensors="pt").input_features
+        tokens = self.model.generate(features)
+        return " ".join(text.strip() for text in self.processor.batch_decode(tokens, skip_special_tokens=True))
 
 class VoiceProcessor:
     """Main voice processing class that handles both STT and TTS."""
     
     def __init__(self):
         self.whisper_model = None
+        self.whisper_backend = None  # "whisper.cpp", "faster-whisper", "onnxruntime" or "openai-whisper"
+        # whisper.cpp and openai-whisper models keep per-call state, so inference is serialized
+        self._whisper_lock = None
+        self.whisper_device = self._detect_whisper_device()
+        self.whisper_model_size = WHISPER_MODEL_SIZE or ("turbo" if self.whisper_device == "cuda" else "base")
         self.tts_engine = None
+        self._pyttsx3_voices = []  # Enumerated once; pyttsx3 queries the OS speech API on every call
+        self._tts_queue = queue.Queue()  # Jobs for the thread that owns the pyttsx3 engine
+        self._stt_batch_queue = None  # (audio, future) pairs for the batching task
+        self._stt_batch_loop = None
+        self._stt_stream = None  # Side CUDA stream for openai-whisper input uploads
+        self._tts_cache = OrderedDict()  # blake2b(method, voice, speed, text) -> result, in LRU order
+        self._tts_cache_lock = threading.Lock()
+        # Cloud STT/TTS calls are IO-bound, so async callers overlap them on this pool
+        self._http_executor = ThreadPoolExecutor(max_workers=HTTP_MAX_WORKERS, thread_name_prefix="voice-http")
+        self._session = self._create_http_session() if REQUESTS_AVAILABLE else None
         self._initialize_services()
     
+    def _create_http_session(self):
+        """Create a requests session that keeps TCP/TLS connections to the cloud APIs alive."""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_MAX_WORKERS, pool_maxsize=HTTP_MAX_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
     def _initialize_services(self):
         """Initialize available voice services."""
-        # Initialize Whisper for STT
-        if WHISPER_AVAILABLE:
+        for backend in self._whisper_backend_order():
             try:
-                self.whisper_model = whisper.load_model("base")
-                print("Whisper model loaded successfully")
+                self.whisper_model = _WhisperCache.get(
+                    backend, self.whisper_model_size, self.whisper_device,
+                    functools.partial(self._load_whisper_model, backend)
+                )
+                self.whisper_backend = backend
+                self._whisper_lock = _WhisperCache.inference_lock(backend, self.whisper_model_size, self.whisper_device)
+                print(f"{backend} Whisper {self.whisper_model_size} model loaded successfully ({self.whisper_device})")
+                if backend == "openai-whisper" and self.whisper_device == "cuda":
+                    # Host-to-GPU copies go on their own stream so they overlap encoder/decoder work
+                    self._stt_stream = torch.cuda.Stream()
+                break
             except Exception as e:
-                print(f"Failed to load Whisper model: {e}")
+                print(f"Failed to load {backend} Whisper model: {e}")
                 self.whisper_model = None
         
         # Initialize pyttsx3 for TTS
         if PYTTSX3_AVAILABLE:
             try:
-                self.tts_engine = pyttsx3.init()
-                # Configure voice settings
-                self.tts_engine.setProperty('rate', 150)  # Speed of speech
-                self.tts_engine.setProperty('volume', 0.8)  # Volume level
+                ready = Future()
+                threading.Thread(target=self._tts_worker, args=(ready,), name="pyttsx3-worker", daemon=True).start()
+                ready.result()
                 print("pyttsx3 TTS engine initialized")
             except Exception as e:
                 print(f"Failed to initialize pyttsx3: {e}")
                 self.tts_engine = None
     
-    def speech_to_text(self, audio_data: Union[str, bytes], 
+    def _detect_whisper_device(self) -> str:
+        """
+        Use CUDA when a GPU-capable Whisper backend can see a GPU.
+        
+        CTranslate2 answers for faster-whisper, so torch is only imported
+        here when openai-whisper is the backend that would run on the GPU.
+        """
+        if WHISPER_BACKEND in CPU_ONLY_WHISPER_BACKENDS:
+            return "cpu"
+        if FASTER_WHISPER_AVAILABLE and WHISPER_BACKEND != "openai-whisper":
+            return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        if WHISPER_AVAILABLE and TORCH_AVAILABLE and WHISPER_BACKEND != "faster-whisper":
+            return "cuda" if torch.cuda.is_available() else "cpu"
+        return "cpu"
+    
+    def _whisper_backend_order(self) -> List[str]:
+        """Whisper backends to try loading, most preferred first."""
+        if WHISPER_BACKEND != "auto":
+            if WHISPER_BACKEND not in WHISPER_BACKENDS:
+                print(f"Unknown WHISPER_BACKEND {WHISPER_BACKEND!r}, expected auto or one of: {', '.join(WHISPER_BACKENDS)}")
+                return []
+            return [WHISPER_BACKEND]
+        
+        # On CPU-only hosts whisper.cpp (FP16 weights, SIMD GEMM, no PyTorch runtime)
+        # and ONNX Runtime's fused int8 kernels beat running the PyTorch model
+        return [
+            backend for backend in WHISPER_BACKENDS
+            if WHISPER_BACKEND_AVAILABLE[backend]
+            and (self.whisper_device == "cpu" or backend not in CPU_ONLY_WHISPER_BACKENDS)
+        ]
+    
+    def _load_whisper_model(self, backend: str):
+        """Load and warm up the Whisper model for a backend on `self.whisper_device`."""
+        model_size = self.whisper_model_size
+        if backend == "whisper.cpp":
+            model = pywhispercpp_model.Model(
+                WHISPER_MODEL_ALIASES.get(model_size, model_size),
+                models_dir=WHISPER_CACHE_DIR,
+                n_threads=os.cpu_count() or 1,
+                print_progress=False,
+                print_realtime=False
+            )
+        elif backend == "faster-whisper":
+            # The int8/fp16 CTranslate2 port
+            model = faster_whisper.WhisperModel(
+                model_size,
+                device=self.whisper_device,
+                compute_type="float16" if self.whisper_device == "cuda" else "int8",
+                num_workers=1,
+                cpu_threads=os.cpu_count() or 0
+            )
+        elif backend == "onnxruntime":
+            model = _OnnxWhisper(model_size)
+        else:
+            if self.whisper_device == "cuda":
+                # Whisper's input shapes are fixed, so let cuDNN pick the fastest conv kernels
+                torch.backends.cudnn.benchmark = True
+            else:
+                torch.set_num_threads(os.cpu_count() or 1)
+            model = self._optimize_whisper_model(whisper.load_model(model_size, device=self.whisper_device))
+        return self._warm_up_whisper(model, backend)
+    
+    def _tts_worker(self, ready: Future):
+        """
+        Own the pyttsx3 engine and run every job that touches it.
+        
+        The engine's event loop isn't reentrant, so concurrent requests are
+        serialized here instead of each starting and stopping the driver.
+        """
+        try:
+            engine = pyttsx3.init()
+            # Configure voice settings
+            engine.setProperty('rate', 150)  # Speed of speech
+            engine.setProperty('volume', 0.8)  # Volume level
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        
+        # Scratch file for rendered speech, in RAM-backed /dev/shm where available
+        fd, self._tts_scratch_path = tempfile.mkstemp(suffix=".wav", prefix="pyttsx3-", dir=SCRATCH_DIR)
+        os.close(fd)
+        atexit.register(_remove_file, self._tts_scratch_path)
+        
+        try:
+            self._pyttsx3_voices = [
+                {
+                    "id": voice.id,
+                    "name": voice.name,
+                    "language": (getattr(voice, 'languages', None) or ['unknown'])[0]
+                }
+                for voice in engine.getProperty('voices')
+            ]
+        except Exception as e:
+            print(f"Error getting voices for pyttsx3: {e}")
+        
+        self.tts_engine = engine
+        ready.set_result(None)
+        
+        while True:
+            func, args, future = self._tts_queue.get()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+    
+    def _run_on_tts_thread(self, func: Callable, *args) -> Any:
+        """Run a function on the pyttsx3 worker thread and wait for its result."""
+        future = Future()
+        self._tts_queue.put((func, args, future))
+        return future.result()
+    
+    def _warm_up_whisper(self, model, backend: str):
+        """
+        Transcribe one second of silence so the first real request doesn't pay
+        for building the mel filterbank, kernel selection and allocator growth.
+        """
+        silence = np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32)
+        try:
+            if backend == "faster-whisper":
+                segments, _ = model.transcribe(silence, language="en", beam_size=1)
+                list(segments)  # Segments are decoded lazily
+            elif backend in ("whisper.cpp", "onnxruntime"):
+                model.transcribe(silence)
+            else:
+                model.transcribe(silence, fp16=self.whisper_device == "cuda", language="en")
+            if backend == "openai-whisper" and self.whisper_device == "cuda":
+                torch.cuda.synchronize()
+        except Exception as e:
+            print(f"Whisper warmup failed: {e}")
+        return model
+    
+    def _optimize_whisper_model(self, model):
+        """
+        Lower an openai-whisper model's precision: fp16 with a compiled
+        encoder on CUDA, dynamic int8 Linear layers on CPU.
+        
+        faster-whisper, whisper.cpp and ONNX Runtime win the "auto" backend
+        order when installed, so on those hosts this runs with
+        WHISPER_BACKEND=openai-whisper, e.g. to use request batching.
+        """
+        if model.device.type == "cuda":
+            model.half()
+            # Whisper's LayerNorm computes in fp32 and needs fp32 weights
+            for module in model.modules():
+                if isinstance(module, torch.nn.LayerNorm):
+                    module.float()
+            return self._compile_whisper_encoder(model)
+        
+        # Whisper subclasses nn.Linear only to cast weights to the input dtype,
+        # which is always fp32 on CPU. quantize_dynamic matches exact types, so
+        # make them plain nn.Linear first or nothing gets quantized.
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    def _compile_whisper_encoder(self, model):
+        """
+        torch.compile the encoder with CUDA graphs, keeping it eager if compilation fails.
+        
+        The encoder always sees 30 second mel windows, and batched requests
+        are padded to STT_MAX_BATCH clips, so it is compiled and captured for
+        exactly two shapes: single clips and full batches. The decoder stays
+        eager: its kv-cache forward hooks and growing sequence length would
+        keep forcing graph breaks and recompiles.
+        """
+        if not hasattr(torch, "compile"):
+            return model
+        
+        encoder = model.encoder
+        try:
+            model.encoder = torch.compile(encoder, mode="reduce-overhead", dynamic=False)
+            # Compilation happens on the first call, so trigger it here where we can fall back
+            for batch_size in (1, STT_MAX_BATCH):
+                mel = torch.zeros(batch_size, model.dims.n_mels, whisper.audio.N_FRAMES,
+                                  device=model.device, dtype=encoder.conv1.weight.dtype)
+                with torch.no_grad():
+                    model.encoder(mel)
+            model.compiled_encoder_batch = STT_MAX_BATCH
+        except Exception as e:
+            print(f"torch.compile failed, using the eager Whisper encoder: {e}")
+            model.encoder = encoder
+        return model
+    
+    def speech_to_text(self, audio_data: Union[str, bytes, memoryview], 
                       method: str = "whisper") -> Dict[str, any]:
         """
         Convert speech to text.
         
         Args:
-            audio_data: Base64 encoded audio data or raw bytes
+            audio_data: Base64 encoded audio data (optionally a data: URL) or raw bytes
             method: STT method to use ("whisper", "google", "azure")
             
         Returns:
             Dict with transcription and metadata
         """
         try:
-            # Decode base64 audio if needed
-            if isinstance(audio_data, str):
-                audio_bytes = base64.b64decode(audio_data)
-            else:
-                audio_bytes = audio_data
+            audio_bytes = self._audio_bytes(audio_data)
+            
+            # Decode in memory when possible, skipping the temp file and ffmpeg
+            audio = self._decode_audio(audio_bytes)
+            if audio is not None:
+                return self._dispatch_speech_to_text(audio, method)
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+            # Save to a temporary file for ffmpeg, on tmpfs so it never touches disk
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False, dir=SCRATCH_DIR) as temp_file:
                 temp_file.write(audio_bytes)
                 temp_path = temp_file.name
             
             try:
-                if method == "whisper" and self.whisper_model:
-                    return self._whisper_transcribe(temp_path)
-                elif method == "google":
-                    return self._google_speech_to_text(temp_path)
-                elif method == "azure":
-                    return self._azure_speech_to_text(temp_path)
-                else:
-                    # Fallback to basic method
-                    return self._fallback_speech_to_text()
+                return self._dispatch_speech_to_text(temp_path, method)
                     
             finally:
                 # Clean up temporary file
@@ -119,23 +469,247 @@ class VoiceProcessor:
                 "method": method
             }
     
-    def _whisper_transcribe(self, audio_path: str) -> Dict[str, any]:
-        """Transcribe audio using Whisper."""
+    async def speech_to_text_async(self, audio_data: Union[str, bytes, memoryview],
+                                   method: str = "whisper") -> Dict[str, any]:
+        """
+        Async variant of `speech_to_text` that batches concurrent requests.
+        
+        With the openai-whisper backend (WHISPER_BACKEND=openai-whisper), clips
+        of up to 30 seconds arriving within a few milliseconds of each other
+        share one encoder pass and one batched greedy decode. Cloud methods run on the HTTP worker pool, and anything
+        else runs `speech_to_text` in a worker thread.
+        
+        Args:
+            audio_data: Base64 encoded audio data (optionally a data: URL) or raw bytes
+            method: STT method to use ("whisper", "google", "azure")
+            
+        Returns:
+            Dict with transcription and metadata
+        """
+        if method in CLOUD_METHODS:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._http_executor, self.speech_to_text, audio_data, method)
+        if method != "whisper" or self.whisper_backend != "openai-whisper":
+            return await asyncio.to_thread(self.speech_to_text, audio_data, method)
+        
         try:
-            result = self.whisper_model.transcribe(audio_path)
+            audio_bytes = self._audio_bytes(audio_data)
+            audio = await asyncio.to_thread(self._decode_audio, audio_bytes)
+            if audio is None or len(audio) > WHISPER_WINDOW_SAMPLES:
+                return await asyncio.to_thread(self.speech_to_text, audio_bytes, method)
+            
+            loop = asyncio.get_running_loop()
+            if self._stt_batch_loop is not loop:
+                self._stt_batch_queue = asyncio.Queue()
+                self._stt_batch_loop = loop
+                loop.create_task(self._stt_batch_worker(self._stt_batch_queue))
+            
+            future = loop.create_future()
+            await self._stt_batch_queue.put((audio, future))
+            return await future
             
+        except Exception as e:
             return {
-                "text": result["text"].strip(),
+                "text": "",
+                "success": False,
+                "error": str(e),
+                "method": method
+            }
+    
+    async def _stt_batch_worker(self, batch_queue: asyncio.Queue):
+        """Collect queued clips into batches and transcribe each batch in a worker thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await batch_queue.get()]
+            deadline = loop.time() + STT_BATCH_DELAY
+            while len(batch) < STT_MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(batch_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                results = await asyncio.to_thread(self._whisper_transcribe_batch, [audio for audio, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def _whisper_transcribe_batch(self, audios: List[np.ndarray]) -> List[Dict[str, any]]:
+        """Transcribe clips of up to 30 seconds with one batched openai-whisper decode."""
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self.whisper_model.dims.n_mels)
+            for audio in audios
+        ])
+        with self._whisper_lock:
+            mels = self._to_whisper_device(mels)
+            fixed_batch = getattr(self.whisper_model, "compiled_encoder_batch", None)
+            if fixed_batch and 1 < len(audios) < fixed_batch:
+                # Pad to the batch the compiled encoder was captured for rather than
+                # recompiling and recapturing CUDA graphs for every batch size
+                padding = mels.new_zeros((fixed_batch - len(audios), *mels.shape[1:]))
+                encoder_input = torch.cat([mels, padding])
+                if self.whisper_device == "cuda":
+                    encoder_input = encoder_input.half()  # As decode() would for the fp16 weights
+                with torch.no_grad():
+                    # Copy out: CUDA graph outputs are overwritten by the next replay
+                    mels = self.whisper_model.encoder(encoder_input)[:len(audios)].clone()
+            # decode() encodes the batch unless it's given encoder output, then decodes greedily
+            results = whisper.decode(self.whisper_model, mels, whisper.DecodingOptions(fp16=self.whisper_device == "cuda"))
+        
+        return [
+            {
+                "text": result.text.strip(),
                 "success": True,
                 "confidence": 1.0,  # Whisper doesn't provide confidence scores
-                "language": result.get("language", "unknown"),
+                "language": result.language,
+                "method": "whisper"
+            }
+            for result in results
+        ]
+    
+    def _to_whisper_device(self, tensor: "torch.Tensor") -> "torch.Tensor":
+        """
+        Move a CPU tensor to the openai-whisper model's device.
+        
+        Only the openai-whisper backend takes tensors, so this path runs with
+        WHISPER_BACKEND=openai-whisper (or when it's the only backend installed).
+        
+        On CUDA the copy is staged through pinned memory and issued on a side
+        stream, so it runs asynchronously and overlaps work already queued on
+        the compute stream, which waits for it before using the result.
+        """
+        if self.whisper_device != "cuda":
+            return tensor.to(self.whisper_model.device)
+        
+        with torch.cuda.stream(self._stt_stream):
+            on_device = tensor.pin_memory().to("cuda", non_blocking=True)
+        compute_stream = torch.cuda.current_stream()
+        compute_stream.wait_stream(self._stt_stream)
+        on_device.record_stream(compute_stream)  # Keep the allocator from reusing it early
+        return on_device
+    
+    def _audio_bytes(self, audio_data: Union[str, bytes, memoryview]) -> Union[bytes, memoryview]:
+        """
+        Get raw audio bytes from base64 text, a base64 data: URL, or raw bytes.
+        
+        Raw bytes are passed through as a memoryview without copying, and a
+        data: URL header is skipped by slicing a view rather than the string.
+        """
+        if isinstance(audio_data, str):
+            encoded = memoryview(audio_data.encode("ascii"))
+        else:
+            encoded = memoryview(audio_data).cast("B")
+            if encoded[:5] != b"data:":
+                return encoded
+        
+        if encoded[:5] == b"data:":
+            comma = bytes(encoded[:DATA_URL_HEADER_MAX]).find(b",")
+            if comma < 0:
+                raise ValueError("Malformed data: URL, expected a base64 payload")
+            encoded = encoded[comma + 1:]
+        
+        return base64.b64decode(encoded, validate=False)
+    
+    def _decode_audio(self, audio_bytes: Union[bytes, memoryview]) -> Optional[np.ndarray]:
+        """
+        Decode audio bytes to a 16 kHz mono float32 array without touching disk.
+        
+        WAV/FLAC/OGG are read with soundfile. Anything else, such as the
+        WebM/Opus that MediaRecorder produces, is decoded in-process with
+        PyAV via faster-whisper instead of piping through an ffmpeg
+        subprocess. Returns None if neither decoder can read the audio.
+        """
+        if SOUNDFILE_AVAILABLE:
+            audio = self._soundfile_decode(audio_bytes)
+            if audio is not None:
+                return audio
+        
+        if FASTER_WHISPER_AVAILABLE:
+            try:
+                return faster_whisper.decode_audio(io.BytesIO(audio_bytes), sampling_rate=WHISPER_SAMPLE_RATE)
+            except Exception:
+                return None
+        
+        return None
+    
+    def _soundfile_decode(self, audio_bytes: Union[bytes, memoryview]) -> Optional[np.ndarray]:
+        """Decode with libsndfile; None for unsupported formats or resampling without scipy."""
+        try:
+            data, sample_rate = soundfile.read(io.BytesIO(audio_bytes), dtype="float32", always_2d=False)
+        except RuntimeError:  # Formats libsndfile can't decode, e.g. WebM
+            return None
+        
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        if sample_rate != WHISPER_SAMPLE_RATE:
+            if not SCIPY_AVAILABLE:
+                return None
+            data = scipy_signal.resample_poly(data, WHISPER_SAMPLE_RATE, sample_rate)
+        
+        return np.ascontiguousarray(data, dtype=np.float32)
+    
+    def _dispatch_speech_to_text(self, audio: Union[str, np.ndarray], method: str) -> Dict[str, any]:
+        """Run the requested STT method on an audio file path or decoded samples."""
+        if method == "whisper" and self.whisper_model:
+            return self._whisper_transcribe(audio)
+        elif method == "google":
+            return self._google_speech_to_text(audio)
+        elif method == "azure":
+            return self._azure_speech_to_text(audio)
+        else:
+            # Fallback to basic method
+            return self._fallback_speech_to_text()
+    
+    def _whisper_transcribe(self, audio: Union[str, np.ndarray]) -> Dict[str, any]:
+        """Transcribe an audio file or 16 kHz mono samples using Whisper."""
+        try:
+            if self.whisper_backend == "faster-whisper":
+                # Greedy decoding like openai-whisper's default; VAD skips silent stretches
+                segments, info = self.whisper_model.transcribe(audio, beam_size=1, vad_filter=True)
+                text = "".join(segment.text for segment in segments)
+                language = info.language
+            elif self.whisper_backend == "whisper.cpp":
+                # Takes a file path or 16 kHz float32 samples, like the other backends
+                with self._whisper_lock:
+                    segments = self.whisper_model.transcribe(audio)
+                text = " ".join(segment.text.strip() for segment in segments)
+                language = "unknown"
+            elif self.whisper_backend == "onnxruntime":
+                if isinstance(audio, str):
+                    if not WHISPER_AVAILABLE:
+                        raise Exception("Audio format not supported without an in-memory decoder")
+                    audio = whisper.load_audio(audio)
+                text = self.whisper_model.transcribe(audio)
+                language = "unknown"
+            else:
+                if isinstance(audio, np.ndarray) and self.whisper_device == "cuda":
+                    # Upload the samples ourselves; whisper then computes the mel on the GPU
+                    audio = self._to_whisper_device(torch.from_numpy(audio))
+                # The kv-cache hooks installed per call would mix concurrent decodes
+                with self._whisper_lock:
+                    result = self.whisper_model.transcribe(audio, fp16=self.whisper_device == "cuda")
+                text = result["text"]
+                language = result.get("language", "unknown")
+            
+            return {
+                "text": text.strip(),
+                "success": True,
+                "confidence": 1.0,  # Whisper doesn't provide confidence scores
+                "language": language,
                 "method": "whisper"
             }
             
         except Exception as e:
             raise Exception(f"Whisper transcription failed: {str(e)}")
     
-    def _google_speech_to_text(self, audio_path: str) -> Dict[str, any]:
+    def _google_speech_to_text(self, audio: Union[str, np.ndarray]) -> Dict[str, any]:
         """Transcribe audio using Google Speech-to-Text API."""
         api_key = os.getenv("GOOGLE_CLOUD_API_KEY") or os.getenv("GOOGLE_API_KEY")
         
@@ -151,7 +725,7 @@ class VoiceProcessor:
             "method": "google"
         }
     
-    def _azure_speech_to_text(self, audio_path: str) -> Dict[str, any]:
+    def _azure_speech_to_text(self, audio: Union[str, np.ndarray]) -> Dict[str, any]:
         """Transcribe audio using Azure Speech Services."""
         api_key = os.getenv("AZURE_SPEECH_KEY")
         region = os.getenv("AZURE_SPEECH_REGION")
@@ -193,6 +767,24 @@ class VoiceProcessor:
         Returns:
             Dict with audio data and metadata
         """
+        key = hashlib.blake2b(f"{method}|{voice}|{speed}|{text}".encode(), digest_size=16).digest()
+        with self._tts_cache_lock:
+            cached = self._tts_cache.get(key)
+            if cached is not None:
+                self._tts_cache.move_to_end(key)
+                return dict(cached)
+        
+        result = self._synthesize(text, method, voice, speed)
+        if result.get("success"):
+            with self._tts_cache_lock:
+                self._tts_cache[key] = result
+                if len(self._tts_cache) > TTS_CACHE_SIZE:
+                    self._tts_cache.popitem(last=False)
+            result = dict(result)
+        return result
+    
+    def _synthesize(self, text: str, method: str, voice: str, speed: float) -> Dict[str, any]:
+        """Run the requested TTS method, turning failures into an error result."""
         try:
             if method == "pyttsx3" and self.tts_engine:
                 return self._pyttsx3_synthesize(text, speed)
@@ -213,36 +805,67 @@ class VoiceProcessor:
                 "method": method
             }
     
+    def text_to_speech_stream(self, text: str,
+                              method: str = "pyttsx3",
+                              voice: str = "default",
+                              speed: float = 1.0) -> Iterator[bytes]:
+        """
+        Convert text to speech, yielding audio as it is synthesized.
+        
+        gTTS yields MP3 data per text segment and pyttsx3 yields a WAV stream
+        sentence by sentence, so playback can start before the whole clip is
+        ready. Other methods yield the complete clip at once.
+        
+        Args:
+            text: Text to convert to speech
+            method: TTS method ("pyttsx3", "gtts", "azure", "google")
+            voice: Voice identifier
+            speed: Speech speed multiplier
+            
+        Yields:
+            Raw audio bytes (not base64 encoded)
+        """
+        if method == "pyttsx3" and self.tts_engine:
+            yield from self._pyttsx3_stream(text, speed)
+        elif method == "gtts" and GTTS_AVAILABLE:
+            yield from gtts.gTTS(text=text, lang=voice, slow=False).stream()
+        else:
+            result = self.text_to_speech(text, method=method, voice=voice, speed=speed)
+            if not result["success"]:
+                raise Exception(result["error"])
+            yield base64.b64decode(result["audio_data"])
+    
+    async def text_to_speech_async(self, text: str,
+                                   method: str = "pyttsx3",
+                                   voice: str = "default",
+                                   speed: float = 1.0) -> Dict[str, any]:
+        """
+        Async variant of `text_to_speech` that runs on the HTTP worker pool,
+        so concurrent requests overlap their network round-trips.
+        
+        Args:
+            text: Text to convert to speech
+            method: TTS method ("pyttsx3", "gtts", "azure", "google")
+            voice: Voice identifier
+            speed: Speech speed multiplier
+            
+        Returns:
+            Dict with audio data and metadata
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._http_executor,
+            functools.partial(self.text_to_speech, text, method=method, voice=voice, speed=speed)
+        )
+    
     def _pyttsx3_synthesize(self, text: str, speed: float = 1.0) -> Dict[str, any]:
         """Synthesize speech using pyttsx3."""
         try:
-            # Set speech rate
-            rate = self.tts_engine.getProperty('rate')
-            self.tts_engine.setProperty('rate', int(rate * speed))
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_path = temp_file.name
-            
             # Generate speech
-            self.tts_engine.save_to_file(text, temp_path)
-            self.tts_engine.runAndWait()
-            
-            # Read the generated audio file
-            with open(temp_path, 'rb') as f:
-                audio_bytes = f.read()
-            
-            # Clean up
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-            
-            # Convert to base64
-            audio_base64 = base64.b64encode(audio_bytes).decode()
+            audio_bytes = self._run_on_tts_thread(self._pyttsx3_render, text, speed)
             
             return {
-                "audio_data": audio_base64,
+                "audio_data": base64.b64encode(audio_bytes).decode("ascii"),
                 "success": True,
                 "format": "wav",
                 "method": "pyttsx3"
@@ -251,33 +874,58 @@ class VoiceProcessor:
         except Exception as e:
             raise Exception(f"pyttsx3 synthesis failed: {str(e)}")
     
+    def _pyttsx3_render(self, text: str, speed: float) -> bytes:
+        """Render speech to WAV bytes; runs on the pyttsx3 worker thread."""
+        # Set speech rate, restoring it afterwards so repeated calls don't compound
+        rate = self.tts_engine.getProperty('rate')
+        self.tts_engine.setProperty('rate', int(rate * speed))
+        
+        try:
+            # pyttsx3 can only write files; jobs run one at a time, so one scratch file is reused
+            self.tts_engine.save_to_file(text, self._tts_scratch_path)
+            self.tts_engine.runAndWait()
+        finally:
+            self.tts_engine.setProperty('rate', rate)
+        
+        with open(self._tts_scratch_path, 'rb') as f:
+            return f.read()
+    
+    def _pyttsx3_stream(self, text: str, speed: float) -> Iterator[bytes]:
+        """Render sentence by sentence, yielding one open-ended WAV stream."""
+        header_sent = False
+        for sentence in SENTENCE_END.split(text.strip()):
+            if not sentence:
+                continue
+            audio_bytes = self._run_on_tts_thread(self._pyttsx3_render, sentence, speed)
+            with wave.open(io.BytesIO(audio_bytes)) as wav:
+                if not header_sent:
+                    yield self._streaming_wav_header(wav.getnchannels(), wav.getsampwidth(), wav.getframerate())
+                    header_sent = True
+                yield wav.readframes(wav.getnframes())
+    
+    @staticmethod
+    def _streaming_wav_header(channels: int, sample_width: int, frame_rate: int) -> bytes:
+        """PCM WAV header with maximal sizes, so players keep reading until the stream ends."""
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", STREAMING_WAV_SIZE, b"WAVE",
+            b"fmt ", 16, 1, channels, frame_rate,
+            frame_rate * channels * sample_width, channels * sample_width, sample_width * 8,
+            b"data", STREAMING_WAV_SIZE - 36
+        )
+    
     def _gtts_synthesize(self, text: str, language: str = "en") -> Dict[str, any]:
         """Synthesize speech using Google Text-to-Speech."""
         try:
             # Create gTTS object
-            tts = gTTS(text=text, lang=language, slow=False)
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-                temp_path = temp_file.name
+            tts = gtts.gTTS(text=text, lang=language, slow=False)
             
-            tts.save(temp_path)
-            
-            # Read the generated audio file
-            with open(temp_path, 'rb') as f:
-                audio_bytes = f.read()
-            
-            # Clean up
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-            
-            # Convert to base64
-            audio_base64 = base64.b64encode(audio_bytes).decode()
+            # Write the MP3 to memory
+            buffer = io.BytesIO()
+            tts.write_to_fp(buffer)
             
             return {
-                "audio_data": audio_base64,
+                "audio_data": base64.b64encode(buffer.getvalue()).decode("ascii"),
                 "success": True,
                 "format": "mp3",
                 "method": "gtts"
@@ -325,24 +973,9 @@ class VoiceProcessor:
         """Get list of available voices for the specified TTS method."""
         try:
             if method == "pyttsx3" and self.tts_engine:
-                voices = self.tts_engine.getProperty('voices')
-                return [
-                    {
-                        "id": voice.id,
-                        "name": voice.name,
-                        "language": getattr(voice, 'languages', ['unknown'])[0] if hasattr(voice, 'languages') else 'unknown'
-                    }
-                    for voice in voices
-                ]
+                return [dict(voice) for voice in self._pyttsx3_voices]
             elif method == "gtts":
-                # gTTS supports many languages
-                return [
-                    {"id": "en", "name": "English", "language": "en"},
-                    {"id": "es", "name": "Spanish", "language": "es"},
-                    {"id": "fr", "name": "French", "language": "fr"},
-                    {"id": "de", "name": "German", "language": "de"},
-                    {"id": "it", "name": "Italian", "language": "it"},
-                ]
+                return [dict(voice) for voice in GTTS_VOICES]
             else:
                 return []
                 
@@ -354,24 +987,31 @@ class VoiceProcessor:
         """Set voice settings for the specified TTS method."""
         try:
             if method == "pyttsx3" and self.tts_engine:
-                if 'rate' in settings:
-                    self.tts_engine.setProperty('rate', settings['rate'])
-                if 'volume' in settings:
-                    self.tts_engine.setProperty('volume', settings['volume'])
-                if 'voice' in settings:
-                    voices = self.tts_engine.getProperty('voices')
-                    for voice in voices:
-                        if voice.id == settings['voice']:
-                            self.tts_engine.setProperty('voice', voice.id)
-                            break
+                self._run_on_tts_thread(self._apply_pyttsx3_settings, settings)
+                # Cached pyttsx3 audio was rendered with the old settings
+                with self._tts_cache_lock:
+                    self._tts_cache.clear()
                             
         except Exception as e:
             print(f"Error setting voice settings: {e}")
     
+    def _apply_pyttsx3_settings(self, settings: Dict[str, Any]):
+        """Apply voice settings to the engine; runs on the pyttsx3 worker thread."""
+        if 'rate' in settings:
+            self.tts_engine.setProperty('rate', settings['rate'])
+        if 'volume' in settings:
+            self.tts_engine.setProperty('volume', settings['volume'])
+        if 'voice' in settings:
+            voices = self.tts_engine.getProperty('voices')
+            for voice in voices:
+                if voice.id == settings['voice']:
+                    self.tts_engine.setProperty('voice', voice.id)
+                    break
+    
     def get_service_status(self) -> Dict[str, bool]:
         """Get status of all voice services."""
         return {
-            "whisper": WHISPER_AVAILABLE and self.whisper_model is not None,
+            "whisper": self.whisper_model is not None,
             "pyttsx3": PYTTSX3_AVAILABLE and self.tts_engine is not None,
             "gtts": GTTS_AVAILABLE,
             "google_cloud": bool(os.getenv("GOOGLE_CLOUD_API_KEY") or os.getenv("GOOGLE_API_KEY")),
@@ -379,8 +1019,9 @@ class VoiceProcessor:
         }
 
 # Factory function for easy instantiation
+@functools.lru_cache(maxsize=1)
 def create_voice_processor() -> VoiceProcessor:
-    """Create and return a VoiceProcessor instance."""
+    """Return the process-wide VoiceProcessor, creating it on first use."""
     return VoiceProcessor()
 
 # Usage example
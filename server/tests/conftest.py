@@ -0,0 +1,35 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The services are a package under server/, imported as `services.<module>`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words embeddings, so tests don't download a model."""
+    
+    def __init__(self, model_name: str, device: str = None):
+        self.dimension = 384
+    
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        embeddings = np.zeros((len(texts), self.dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimension] += 1
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+    
+    def half(self):
+        return self
+
+
+@pytest.fixture
+def hashing_encoder(monkeypatch):
+    """Make VectorStore embed with HashingEncoder instead of a SentenceTransformers model."""
+    from services import vector_store
+    monkeypatch.setattr(vector_store, "SentenceTransformer", HashingEncoder)
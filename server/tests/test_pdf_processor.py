@@ -0,0 +1,159 @@
+"""
+Tests for PDFProcessor page extraction and text chunking.
+"""
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("pytesseract")
+
+from services import pdf_processor
+from services.pdf_processor import PDFProcessor
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    monkeypatch.delenv("OCR_CACHE_PATH", raising=False)
+    return PDFProcessor()
+
+
+def make_pdf(path, n_pages: int) -> str:
+    """Write a PDF whose pages each hold a line of text and a small distinct image."""
+    doc = fitz.open()
+    for page_num in range(n_pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {page_num} body text")
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8))
+        pixmap.clear_with(30 * page_num)
+        page.insert_image(fitz.Rect(100, 100, 140, 140), pixmap=pixmap)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_pool_and_pipelined_extraction_match(tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 5)
+
+    pooled = pdf_processor._process_pages_in_pool(pdf_path, 5)
+
+    assert pooled == pdf_processor._process_pages_pipelined(pdf_path, 5)
+    assert [page['text']['page'] for page in pooled] == [1, 2, 3, 4, 5]
+    assert all(len(page['images']) == 1 for page in pooled)
+    assert pdf_processor._get_page_pool() is pdf_processor._get_page_pool()
+
+
+@pytest.mark.parametrize("n_pages", [2, 5])
+def test_extract_content_keeps_page_order(processor, tmp_path, n_pages):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", n_pages)
+
+    content = processor.extract_content(pdf_path)
+
+    assert content['metadata']['page_count'] == n_pages
+    assert [entry['text'].strip() for entry in content['text_content']] == [
+        f"Page {page_num} body text" for page_num in range(n_pages)
+    ]
+    assert [image['page'] for image in content['images']] == list(range(1, n_pages + 1))
+    assert all('_ocr_image' not in image and 'ocr_text' in image for image in content['images'])
+
+
+def test_chunk_text_slices_overlapping_word_windows(processor):
+    text = "w0 w1\tw2\n\nw3 w4  w5 w6 w7 w8 w9"
+    words = text.split()
+
+    chunks = processor.chunk_text([{'page': 2, 'text': text}], chunk_size=4, overlap=1)
+
+    assert [(chunk['start_word'], chunk['end_word']) for chunk in chunks] == [(0, 4), (3, 7), (6, 10), (9, 10)]
+    for chunk in chunks:
+        # Each chunk is one slice of the page text, whitespace inside it kept as is
+        assert chunk['text'] in text
+        assert chunk['text'].split() == words[chunk['start_word']:chunk['end_word']]
+        assert chunk['word_count'] == chunk['end_word'] - chunk['start_word']
+        assert chunk['page'] == 2
+    assert chunks[0]['text'] == "w0 w1\tw2\n\nw3"
+    assert [chunk['chunk_id'] for chunk in chunks] == [0, 1, 2, 3]
+
+
+def test_chunk_text_numbers_chunks_across_pages(processor):
+    pages = [{'page': 1, 'text': "a b c"}, {'page': 2, 'text': "   "}, {'page': 3, 'text': "d e"}]
+
+    chunks = processor.chunk_text(pages, chunk_size=2, overlap=0)
+
+    assert [(chunk['chunk_id'], chunk['page'], chunk['text']) for chunk in chunks] == [
+        (0, 1, "a b"), (1, 1, "c"), (2, 3, "d e")
+    ]
+
+
+def test_chunk_text_overlap_at_least_chunk_size_still_advances(processor):
+    chunks = processor.chunk_text([{'page': 1, 'text': "a b c"}], chunk_size=2, overlap=5)
+
+    assert [chunk['text'] for chunk in chunks] == ["a b", "b c", "c"]
+
+
+class CountingOCR:
+    """Stand-in for the tesseract batch that decodes each image's bytes as its text."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, images):
+        self.batches.append([image_bytes for image_bytes, _ in images])
+        return [image_bytes.decode() for image_bytes, _ in images]
+
+
+@pytest.fixture
+def ocr(processor, monkeypatch):
+    counting_ocr = CountingOCR()
+    monkeypatch.setattr(processor, "_perform_batch_ocr", counting_ocr)
+    processor._tesseract_ok = True
+    return counting_ocr
+
+
+def test_ocr_cache_runs_each_distinct_image_once(processor, ocr):
+    images = [(b"logo", 'png'), (b"chart", 'png'), (b"logo", 'png')]
+
+    assert processor._ocr_images(images) == ["logo", "chart", "logo"]
+    assert processor._ocr_images(images[:1]) == ["logo"]
+    assert ocr.batches == [[b"logo", b"chart"]]
+
+
+def test_ocr_cache_is_bounded_lru(processor, ocr, monkeypatch):
+    monkeypatch.setattr(pdf_processor, "OCR_MEMORY_CACHE_SIZE", 2)
+    images = [(text, 'png') for text in (b"a", b"b", b"c", b"d")]
+
+    # More distinct images than the cache holds still come back complete
+    assert processor._ocr_images(images) == ["a", "b", "c", "d"]
+    assert list(processor._ocr_cache) == [pdf_processor.hashlib.md5(text).hexdigest() for text in (b"c", b"d")]
+
+    processor._ocr_images([(b"c", 'png')])
+    processor._ocr_images([(b"e", 'png')])
+    assert list(processor._ocr_cache.values()) == ["c", "e"]
+    assert ocr.batches[1:] == [[b"e"]]
+
+
+def test_lmdb_ocr_cache_persists_across_processors(tmp_path, monkeypatch):
+    pytest.importorskip("lmdb")
+    monkeypatch.setattr(pdf_processor, "_ocr_cache_envs", {})
+    images = [(b"logo", 'png'), (b"chart", 'png')]
+
+    counting_ocrs = []
+    for _ in range(2):
+        processor = PDFProcessor(ocr_cache_path=str(tmp_path / "ocr"))
+        processor._tesseract_ok = True
+        counting_ocrs.append(CountingOCR())
+        monkeypatch.setattr(processor, "_perform_batch_ocr", counting_ocrs[-1])
+        assert processor._ocr_images(images) == ["logo", "chart"]
+
+    assert counting_ocrs[0].batches == [[b"logo", b"chart"]]
+    assert counting_ocrs[1].batches == []
+
+
+def test_lmdb_errors_fall_back_to_ocr(processor, ocr):
+    lmdb = pytest.importorskip("lmdb")
+
+    class FailingEnvironment:
+        def begin(self, write=False):
+            raise lmdb.Error("map full")
+
+    processor._ocr_cache_env = FailingEnvironment()
+
+    assert processor._ocr_images([(b"logo", 'png')]) == ["logo"]
+    assert ocr.batches == [[b"logo"]]
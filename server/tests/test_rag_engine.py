@@ -0,0 +1,140 @@
+"""
+Tests for RAGEngine answer caching, context building and chunk diversity.
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("sentence_transformers")
+
+from services import rag_engine
+from services.rag_engine import AnswerCache, RAGEngine
+from services.vector_store import VectorStore
+
+
+pytestmark = pytest.mark.usefixtures("hashing_encoder")
+
+
+class RecordingLLM:
+    """LLM client stand-in that counts generate calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+
+def make_chunk(doc_id: str, text: str, page: int = 1) -> dict:
+    words = text.split()
+    return {
+        'document_id': doc_id,
+        'text': text,
+        'metadata': {'page': page},
+        'minhash': None,
+        '_word_set': frozenset(word.lower() for word in words),
+        '_length': len(words),
+    }
+
+
+@pytest.fixture
+def engine():
+    store = VectorStore(index_type="flat")
+    store.add_document("report", [
+        {"text": "Revenue grew by twenty percent in 2023 driven by strong product sales in every region.", "page": 1},
+        {"text": "Operating costs fell slightly in 2023 as the company consolidated its warehouses.", "page": 2},
+    ])
+    engine = RAGEngine(store, RecordingLLM())
+    engine.min_relevance_score = 0.0  # Hashed bag-of-words scores run lower than a real model's
+    return engine
+
+
+def test_answer_cache_key_ignores_case_and_whitespace():
+    assert AnswerCache.make_key("What is  Revenue?", None, 1) == AnswerCache.make_key("what is revenue?", None, 1)
+    assert AnswerCache.make_key("what is revenue?", None, 1) != AnswerCache.make_key("what is revenue?", None, 2)
+    assert AnswerCache.make_key("what is revenue?", ("a",), 1) != AnswerCache.make_key("what is revenue?", None, 1)
+
+
+def test_answer_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rag_engine.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(capacity=4, ttl=10)
+    cache.put("key", {"answer": "cached"})
+
+    now[0] += 9
+    assert cache.get("key") == {"answer": "cached"}
+    now[0] += 2
+    assert cache.get("key") is None
+
+
+def test_answer_cache_evicts_least_recently_used_and_returns_copies():
+    cache = AnswerCache(capacity=2, ttl=60)
+    cache.put("a", {"sources": []})
+    cache.put("b", {"sources": []})
+    cache.get("a")["sources"].append("mutated")
+    cache.put("c", {"sources": []})
+
+    assert cache.get("a") == {"sources": []}
+    assert cache.get("b") is None
+
+
+def test_query_reuses_answer_until_store_changes(engine):
+    first = engine.query("How much did revenue grow in 2023?")
+    second = engine.query("how much did  revenue grow in 2023?")
+    assert second == first
+    assert engine.llm_client.calls == 1
+
+    engine.query("How much did revenue grow in 2023?", document_ids=["report"])
+    assert engine.llm_client.calls == 2
+
+    engine.vector_store.add_document("other", [{"text": "Revenue grew again in 2024 with record sales across regions."}])
+    engine.query("How much did revenue grow in 2023?")
+    assert engine.llm_client.calls == 3
+
+
+def test_build_context_within_budget(engine):
+    chunks = [make_chunk("a", "alpha beta gamma", page=3), make_chunk("b", "delta epsilon")]
+
+    context, tokens = engine._build_context(chunks, "standard")
+
+    assert context == (
+        "[Source 1 - Document: a, Page: 3]\nalpha beta gamma\n"
+        "\n[Source 2 - Document: b, Page: 1]\ndelta epsilon\n"
+    )
+    assert tokens == len(context.split())
+
+
+@pytest.mark.parametrize("budget", [1, 12, 15])
+def test_build_context_truncates_at_budget(engine, budget):
+    engine.max_context_length = budget
+    chunks = [make_chunk("a", "one two three four five"), make_chunk("b", "six seven eight nine ten")]
+
+    context, tokens = engine._build_context(chunks, "standard")
+
+    assert context.endswith("... [truncated]")
+    assert tokens == len(context.split())
+    assert tokens <= budget + 2  # The "... [truncated]" marker
+
+
+def test_ensure_diversity_skips_near_duplicates():
+    chunks = [
+        make_chunk("a", "revenue grew by twenty percent in 2023"),
+        make_chunk("a", "revenue grew by twenty percent in 2023 overall"),
+        make_chunk("b", "operating costs fell as warehouses were consolidated"),
+        make_chunk("c", "headcount stayed flat through the year"),
+    ]
+    engine = RAGEngine.__new__(RAGEngine)
+    engine.max_sources = 5
+
+    assert engine._ensure_diversity(chunks) == [chunks[0], chunks[2], chunks[3]]
+    assert engine._ensure_diversity(chunks, max_results=2) == [chunks[0], chunks[2]]
+
+
+def test_ensure_diversity_uses_minhash_signatures():
+    signatures = [np.arange(8), np.arange(8), np.arange(8) + 100]
+    chunks = [dict(make_chunk("a", f"text {i}"), minhash=signature) for i, signature in enumerate(signatures)]
+    engine = RAGEngine.__new__(RAGEngine)
+    engine.max_sources = 5
+
+    assert engine._ensure_diversity(chunks) == [chunks[0], chunks[2]]
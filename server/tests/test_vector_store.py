@@ -0,0 +1,78 @@
+"""
+Regression tests for VectorStore search after removals and with document filters.
+"""
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("sentence_transformers")
+
+from services.vector_store import VectorStore
+
+
+pytestmark = pytest.mark.usefixtures("hashing_encoder")
+
+
+def make_store(**kwargs) -> VectorStore:
+    """A store whose query matches "big" far better than "small", with unrelated "other" chunks."""
+    store = VectorStore(**kwargs)
+    store.add_document("big", [{"text": f"alpha beta gamma filler{i}"} for i in range(2000)])
+    store.add_document("small", [{"text": f"alpha beta delta item{i}"} for i in range(8)])
+    store.add_document("other", [{"text": f"zeta eta theta {i}"} for i in range(500)])
+    return store
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "flat"])
+@pytest.mark.parametrize("keep_raw_vectors", [False, True])
+def test_search_after_remove_document(index_type, keep_raw_vectors):
+    store = make_store(index_type=index_type, keep_raw_vectors=keep_raw_vectors)
+    assert store.remove_document("big")
+    
+    results = store.search("alpha beta gamma", k=5)
+    
+    assert len(results) == 5
+    assert {result['document_id'] for result in results} == {"small"}
+
+
+def test_search_after_remove_document_and_reload(tmp_path):
+    store = make_store()
+    store.remove_document("big")
+    store.save(str(tmp_path / "store"))
+    
+    for mmap in (False, True):
+        loaded = VectorStore()
+        loaded.load(str(tmp_path / "store"), mmap=mmap)
+        results = loaded.search("alpha beta gamma", k=5)
+        assert [result['document_id'] for result in results] == ["small"] * 5
+
+
+def test_search_after_compaction():
+    store = make_store()
+    store.remove_document("big")  # Over HNSW_COMPACT_FRACTION, so the graph is rebuilt
+    
+    assert store.index.ntotal == 508
+    assert len(store.search("alpha beta gamma", k=5)) == 5
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "flat"])
+def test_filtered_search_by_vector_returns_k_results(index_type):
+    store = make_store(index_type=index_type)
+    query = store.embed_query("alpha beta gamma")
+    
+    results = store.search_by_vector(query, k=5, document_ids=["small"])
+    
+    assert len(results) == 5
+    assert {result['document_id'] for result in results} == {"small"}
+    
+    results = store.search_by_vector(query, k=10, document_ids=["small", "other"])
+    assert len(results) == 10
+
+
+def test_filtered_search_by_vector_with_removed_document():
+    store = make_store()
+    store.add_document("extra", [{"text": f"alpha beta epsilon {i}"} for i in range(8)])
+    store.remove_document("other")
+    query = store.embed_query("alpha beta gamma")
+    
+    results = store.search_by_vector(query, k=5, document_ids=["small", "other"])
+    
+    assert [result['document_id'] for result in results] == ["small"] * 5
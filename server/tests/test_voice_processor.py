@@ -0,0 +1,169 @@
+"""
+Tests for VoiceProcessor Whisper backend selection and speech-to-text batching.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from services import voice_processor
+from services.voice_processor import VoiceProcessor
+
+
+@pytest.fixture
+def no_optional_services(monkeypatch):
+    """Keep VoiceProcessor() from starting pyttsx3 or loading a real model."""
+    monkeypatch.setattr(voice_processor, "PYTTSX3_AVAILABLE", False)
+    monkeypatch.setattr(voice_processor._WhisperCache, "_models", {})
+    monkeypatch.setattr(voice_processor._WhisperCache, "_inference_locks", {})
+    monkeypatch.setattr(VoiceProcessor, "_detect_whisper_device", lambda self: "cpu")
+
+
+def bare_processor(backend: str = None, device: str = "cpu") -> VoiceProcessor:
+    """A VoiceProcessor with only the attributes the STT paths use, and no model loaded."""
+    processor = VoiceProcessor.__new__(VoiceProcessor)
+    processor.whisper_backend = backend
+    processor.whisper_device = device
+    processor.whisper_model = None
+    processor._whisper_lock = threading.Lock()
+    processor._stt_batch_queue = None
+    processor._stt_batch_loop = None
+    return processor
+
+
+@pytest.mark.parametrize("device, expected", [
+    ("cpu", ["whisper.cpp", "faster-whisper", "onnxruntime", "openai-whisper"]),
+    ("cuda", ["faster-whisper", "openai-whisper"]),
+])
+def test_auto_backend_order(monkeypatch, device, expected):
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND", "auto")
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND_AVAILABLE", dict.fromkeys(voice_processor.WHISPER_BACKENDS, True))
+
+    assert bare_processor(device=device)._whisper_backend_order() == expected
+
+
+def test_auto_backend_order_skips_missing_backends(monkeypatch):
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND", "auto")
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND_AVAILABLE", {
+        "whisper.cpp": False, "faster-whisper": False, "onnxruntime": True, "openai-whisper": True,
+    })
+
+    assert bare_processor()._whisper_backend_order() == ["onnxruntime", "openai-whisper"]
+
+
+@pytest.mark.parametrize("setting, expected", [("openai-whisper", ["openai-whisper"]), ("bogus", [])])
+def test_explicit_backend_order(monkeypatch, setting, expected):
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND", setting)
+
+    assert bare_processor()._whisper_backend_order() == expected
+
+
+def test_initialization_falls_back_to_next_backend(monkeypatch, no_optional_services):
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND", "auto")
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND_AVAILABLE", {
+        "whisper.cpp": True, "faster-whisper": False, "onnxruntime": True, "openai-whisper": True,
+    })
+    attempts = []
+
+    def load(self, backend):
+        attempts.append(backend)
+        if backend == "whisper.cpp":
+            raise RuntimeError("no GGML weights")
+        return f"{backend} model"
+
+    monkeypatch.setattr(VoiceProcessor, "_load_whisper_model", load)
+
+    processor = VoiceProcessor()
+
+    assert attempts == ["whisper.cpp", "onnxruntime"]
+    assert processor.whisper_backend == "onnxruntime"
+    assert processor.whisper_model == "onnxruntime model"
+    assert processor._stt_stream is None
+
+
+def test_processors_share_model_and_inference_lock(monkeypatch, no_optional_services):
+    monkeypatch.setattr(voice_processor, "WHISPER_BACKEND", "openai-whisper")
+    monkeypatch.setattr(VoiceProcessor, "_load_whisper_model", lambda self, backend: object())
+
+    first, second = VoiceProcessor(), VoiceProcessor()
+
+    assert first.whisper_model is second.whisper_model
+    assert first._whisper_lock is second._whisper_lock
+
+
+def test_concurrent_requests_share_one_batch(monkeypatch):
+    processor = bare_processor("openai-whisper")
+    processor.whisper_model = object()
+    monkeypatch.setattr(processor, "_decode_audio", lambda audio_bytes: np.zeros(len(audio_bytes), dtype=np.float32))
+    batches = []
+
+    def transcribe_batch(audios):
+        batches.append(len(audios))
+        return [{"text": str(len(audio)), "success": True} for audio in audios]
+
+    monkeypatch.setattr(processor, "_whisper_transcribe_batch", transcribe_batch)
+
+    async def run():
+        return await asyncio.gather(*(processor.speech_to_text_async(b"x" * n) for n in range(1, 6)))
+
+    results = asyncio.run(run())
+
+    assert batches == [5]
+    assert [result["text"] for result in results] == ["1", "2", "3", "4", "5"]
+
+
+def test_batches_hold_at_most_max_batch_clips(monkeypatch):
+    processor = bare_processor("openai-whisper")
+    processor.whisper_model = object()
+    monkeypatch.setattr(processor, "_decode_audio", lambda audio_bytes: np.zeros(1, dtype=np.float32))
+    batches = []
+
+    def transcribe_batch(audios):
+        batches.append(len(audios))
+        return [{"text": "", "success": True}] * len(audios)
+
+    monkeypatch.setattr(processor, "_whisper_transcribe_batch", transcribe_batch)
+
+    async def run():
+        return await asyncio.gather(*(
+            processor.speech_to_text_async(b"x") for _ in range(voice_processor.STT_MAX_BATCH + 3)
+        ))
+
+    asyncio.run(run())
+
+    assert batches == [voice_processor.STT_MAX_BATCH, 3]
+
+
+def test_other_backends_skip_batching(monkeypatch):
+    processor = bare_processor("faster-whisper")
+    monkeypatch.setattr(processor, "speech_to_text", lambda audio_data, method: {"text": "direct", "success": True})
+    monkeypatch.setattr(processor, "_whisper_transcribe_batch", lambda audios: pytest.fail("batched"))
+
+    result = asyncio.run(processor.speech_to_text_async(b"audio"))
+
+    assert result["text"] == "direct"
+
+
+def test_openai_whisper_inference_is_serialized():
+    active = []
+    overlaps = []
+
+    class Model:
+        def transcribe(self, audio, **kwargs):
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+            return {"text": "hello", "language": "en"}
+
+    processor = bare_processor("openai-whisper")
+    processor.whisper_model = Model()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(processor._whisper_transcribe, ["a.wav"] * 8))
+
+    assert [result["text"] for result in results] == ["hello"] * 8
+    assert max(overlaps) == 1